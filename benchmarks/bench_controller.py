@@ -0,0 +1,616 @@
+"""Benchmarks of NanoleafController and PanelLight against a fake device.
+
+Measures command latency percentiles, the executor and requests transport
+the controller started with against its aiohttp session, the threaded event
+stream reader it started with against the asyncio one, scene apply time
+versus panel count, the skew of one scene across controllers of unequal
+latency, touch events per second and touch to trigger latency, render_effect
+rendering and animData encoding on 500 and 2000 panel layouts, the
+extControl stream frame rate and memory per controller, and prints the
+results as JSON:
+
+    python benchmarks/bench_controller.py --output bench.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections.abc import Awaitable, Callable
+from functools import partial
+import json
+import os
+from pathlib import Path
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from homeassistant.core import HomeAssistant, callback  # noqa: E402
+
+from benchmarks.fake_nanoleaf import (  # noqa: E402
+    SHAPES_CONTROLLER,
+    FakeNanoleaf,
+    triangle_layout,
+)
+from custom_components.nanoleaf_panels.const import EVENT  # noqa: E402
+from custom_components.nanoleaf_panels.coordinator import (  # noqa: E402
+    async_apply_scene,
+)
+from custom_components.nanoleaf_panels.light import PanelLight  # noqa: E402
+from custom_components.nanoleaf_panels.nanoleaf_controller import (  # noqa: E402
+    GESTURES,
+    NanoleafController,
+)
+from custom_components.nanoleaf_panels.renderer import (  # noqa: E402
+    EFFECTS,
+    custom_anim_data,
+    render,
+)
+
+
+def percentiles(samples: list[float]) -> dict[str, float]:
+    """Return latency percentiles in milliseconds."""
+    ordered = sorted(samples)
+
+    def pick(fraction: float) -> float:
+        index = min(int(fraction * len(ordered)), len(ordered) - 1)
+        return round(ordered[index] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p50_ms": pick(0.50),
+        "p90_ms": pick(0.90),
+        "p99_ms": pick(0.99),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+async def timed(samples: list[float], call: Callable[[], Awaitable[Any]]) -> None:
+    """Run a call and record its duration."""
+    start = time.perf_counter()
+    await call()
+    samples.append(time.perf_counter() - start)
+
+
+async def connect(hass: HomeAssistant, device: FakeNanoleaf) -> NanoleafController:
+    """Return a controller for a fake device with its info loaded."""
+    controller = NanoleafController(hass, device.netloc, device.token, batch_window=0)
+    await controller.get_info()
+    return controller
+
+
+async def bench_command_latency(
+    hass: HomeAssistant, iterations: int, latency: float
+) -> dict[str, Any]:
+    """Measure the latency of individual commands."""
+    device = FakeNanoleaf(panels=15, latency=latency)
+    await device.start()
+    try:
+        controller = await connect(hass, device)
+        panel_ids = sorted(controller.framebuffer.panel_ids)
+        results = {}
+
+        samples: list[float] = []
+        for index in range(iterations):
+            await timed(
+                samples, lambda index=index: controller.set_brightness(index % 100, 0)
+            )
+        results["set_brightness"] = percentiles(samples)
+
+        samples = []
+        for index in range(iterations):
+            panel_id = panel_ids[index % len(panel_ids)]
+            color = (index % 256, 0, 255 - index % 256)
+            await timed(
+                samples,
+                lambda panel_id=panel_id, color=color: controller.display_static_effect(
+                    panel_id, color, 0
+                ),
+            )
+        results["display_static_effect"] = percentiles(samples)
+
+        light = PanelLight(panel_ids[0], "Panel01", controller, controller.info)
+        light.hass = hass
+        samples = []
+        for index in range(iterations):
+            await timed(
+                samples,
+                lambda index=index: light.async_turn_on(rgb_color=(index % 256, 0, 0)),
+            )
+        results["panel_light_turn_on"] = percentiles(samples)
+        return results
+    finally:
+        await device.stop()
+
+
+async def bench_transport(
+    hass: HomeAssistant, iterations: int, latency: float, burst: int
+) -> dict[str, Any]:
+    """Compare a requests call in the executor with the aiohttp session.
+
+    The executor path is how every command used to be sent: one blocking
+    requests call per command, each on a new connection.
+    """
+    device = FakeNanoleaf(panels=15, latency=latency)
+    await device.start()
+    try:
+        controller = await connect(hass, device)
+        url = f"http://{device.netloc}/api/v1/{device.token}/state/brightness"
+        path = f"{device.token}/state/brightness"
+
+        def payload(index: int) -> str:
+            return json.dumps({"brightness": {"value": index % 100, "duration": 0}})
+
+        async def executor_put(index: int) -> None:
+            await hass.async_add_executor_job(
+                partial(requests.put, url, payload(index), timeout=5)
+            )
+
+        async def session_put(index: int) -> None:
+            await controller._request(  # pylint: disable=protected-access
+                "PUT", path, payload(index)
+            )
+
+        results = {}
+        transports = (("executor_requests", executor_put), ("aiohttp", session_put))
+        for name, put in transports:
+            samples: list[float] = []
+            for index in range(iterations):
+                await timed(samples, lambda index=index: put(index))
+            # A burst of concurrent commands, as a scene over many lights sends.
+            start = time.perf_counter()
+            await asyncio.gather(*(put(index) for index in range(burst)))
+            elapsed = time.perf_counter() - start
+            results[name] = {
+                "sequential": percentiles(samples),
+                "burst": burst,
+                "burst_ms": round(elapsed * 1000, 3),
+            }
+        return results
+    finally:
+        await device.stop()
+
+
+def legacy_read_events(
+    hass: HomeAssistant,
+    url: str,
+    events: int,
+    panel_entities: dict[str, tuple[str | None, str]],
+) -> None:
+    """Read touch events the way the integration first did, on a thread.
+
+    The stream is read one byte per iter_lines chunk and every gesture is
+    fired with the thread-safe hass.bus.fire. Returns after events gestures.
+    """
+    response = requests.get(url, stream=True, timeout=None)
+    read = 0
+    try:
+        for line in response.iter_lines(chunk_size=1):
+            decoded_line = line.decode("utf-8")
+            if not decoded_line.startswith("data:"):
+                continue
+            event = json.loads(decoded_line[len("data:") :])["events"][0]
+            device_id, entity_id = panel_entities[str(event["panelId"])]
+            hass.bus.fire(
+                EVENT,
+                {
+                    "device_id": device_id,
+                    "entity_id": entity_id,
+                    "type": GESTURES[event["gesture"]],
+                },
+            )
+            read += 1
+            if read == events:
+                return
+    finally:
+        response.close()
+
+
+async def bench_stream_reader(
+    hass: HomeAssistant, events: int, samples: int
+) -> dict[str, Any]:
+    """Compare the threaded byte-wise stream reader with the asyncio one.
+
+    CPU time is that of the whole process, fake device included, so only the
+    difference between the readers is meaningful.
+    """
+    device = FakeNanoleaf(panels=30)
+    await device.start()
+    try:
+        controller = await connect(hass, device)
+        panel_ids = controller.framebuffer.panel_ids
+        panel_entities: dict[str, tuple[str | None, str]] = {
+            str(panel_id): ("device", f"light.panel_{panel_id}")
+            for panel_id in panel_ids
+        }
+        controller._panel_entities = panel_entities  # pylint: disable=protected-access
+        url = f"http://{device.netloc}/api/v1/{device.token}/events?id=4"
+        readers: dict[str, Callable[[], Awaitable[Any]]] = {
+            "thread_requests": lambda: hass.async_add_executor_job(
+                legacy_read_events, hass, url, events + samples, panel_entities
+            ),
+            "asyncio_sse": controller.async_process_events_stream,
+        }
+
+        results = {}
+        for name, reader in readers.items():
+            fired = 0
+            sent = 0.0
+            latencies: list[float] = []
+            done = asyncio.Event()
+
+            @callback
+            def count(_: Any) -> None:
+                nonlocal fired
+                fired += 1
+                if sent:
+                    latencies.append(time.perf_counter() - sent)
+                    done.set()
+                elif fired == events:
+                    done.set()
+
+            unsub = hass.bus.async_listen(EVENT, count)
+            task = asyncio.ensure_future(reader())
+            while not device.connected_streams:
+                await asyncio.sleep(0.01)
+
+            cpu = time.process_time()
+            start = time.perf_counter()
+            for index in range(events):
+                panel_id = panel_ids[index % len(panel_ids)]
+                device.push_event(4, [{"panelId": panel_id, "gesture": index % 2}])
+            await asyncio.wait_for(done.wait(), 120)
+            elapsed = time.perf_counter() - start
+            cpu = time.process_time() - cpu
+
+            # Touch to trigger latency, one gesture at a time.
+            for index in range(samples):
+                done.clear()
+                sent = time.perf_counter()
+                device.push_event(4, [{"panelId": panel_ids[0], "gesture": index % 2}])
+                await asyncio.wait_for(done.wait(), 5)
+            unsub()
+            # The thread returns by itself after the last gesture.
+            task.cancel()
+            device.drop_streams()
+            while device.connected_streams:
+                await asyncio.sleep(0.01)
+            results[name] = {
+                "events_per_second": round(events / elapsed),
+                "cpu_us_per_event": round(cpu / events * 1e6, 1),
+                "touch_to_trigger": percentiles(latencies),
+            }
+        return results
+    finally:
+        await device.stop()
+
+
+async def bench_scene_apply(
+    hass: HomeAssistant, panel_counts: list[int], repeats: int, latency: float
+) -> list[dict[str, Any]]:
+    """Measure how long a scene touching every panel takes to apply."""
+    results = []
+    for panels in panel_counts:
+        device = FakeNanoleaf(panels=panels, latency=latency)
+        await device.start()
+        try:
+            controller = await connect(hass, device)
+            panel_ids = controller.framebuffer.panel_ids
+            samples: list[float] = []
+            for repeat in range(repeats):
+                frame = {
+                    panel_id: ((repeat * 37 + index) % 256, repeat % 256, 128, 5)
+                    for index, panel_id in enumerate(panel_ids)
+                }
+                await timed(
+                    samples, lambda frame=frame: controller.async_set_panels(frame)
+                )
+            results.append(
+                {
+                    "panels": panels,
+                    "requests_per_scene": device.requests["effects"] / repeats,
+                    **percentiles(samples),
+                }
+            )
+        finally:
+            await device.stop()
+    return results
+
+
+async def bench_multi_controller(
+    hass: HomeAssistant, latencies: list[float], repeats: int
+) -> dict[str, Any]:
+    """Measure how far apart a scene lands on controllers of unequal latency."""
+    devices = [FakeNanoleaf(panels=15, latency=latency) for latency in latencies]
+    for device in devices:
+        await device.start()
+    try:
+        controllers = [await connect(hass, device) for device in devices]
+        for controller in controllers:
+            # Warm up the latency averages the lead times are computed from.
+            panel_ids = controller.framebuffer.panel_ids
+            for repeat in range(5):
+                await controller.async_set_panels(
+                    {panel_id: (repeat, 0, 0, 5) for panel_id in panel_ids}
+                )
+
+        def skew() -> float:
+            times = [device.applied_at[-1] for device in devices]
+            return max(times) - min(times)
+
+        unaligned: list[float] = []
+        aligned: list[float] = []
+        apply_times: list[float] = []
+        for repeat in range(repeats):
+            frames = {
+                controller: {
+                    panel_id: (repeat % 256, 255, 0, 5)
+                    for panel_id in controller.framebuffer.panel_ids
+                }
+                for controller in controllers
+            }
+            await asyncio.gather(
+                *(
+                    controller.async_set_panels(frame)
+                    for controller, frame in frames.items()
+                )
+            )
+            unaligned.append(skew())
+            for frame in frames.values():
+                for panel_id, (red, green, blue, transition) in frame.items():
+                    frame[panel_id] = (red, 0, blue, transition)
+            result = await async_apply_scene(frames)
+            aligned.append(skew())
+            apply_times.append(result["apply_time"])
+        return {
+            "latencies_s": latencies,
+            "unaligned_skew": percentiles(unaligned),
+            "aligned_skew": percentiles(aligned),
+            "aligned_apply_time": percentiles(apply_times),
+        }
+    finally:
+        for device in devices:
+            await device.stop()
+
+
+async def bench_touch_dispatch(hass: HomeAssistant, events: int) -> dict[str, Any]:
+    """Measure touch events per second from the SSE stream to the event bus."""
+    device = FakeNanoleaf(panels=30)
+    await device.start()
+    try:
+        controller = await connect(hass, device)
+        panel_ids = controller.framebuffer.panel_ids
+        # The benchmark has no entity registry, so fill the panel index the
+        # registry listener would build.
+        controller._panel_entities = {  # pylint: disable=protected-access
+            str(panel_id): ("device", f"light.panel_{panel_id}")
+            for panel_id in panel_ids
+        }
+        received = 0
+        done = asyncio.Event()
+
+        def count(_: Any) -> None:
+            nonlocal received
+            received += 1
+            if received == events:
+                done.set()
+
+        unsub = hass.bus.async_listen(EVENT, count)
+        stream = hass.async_create_background_task(
+            controller.async_process_events_stream(), "bench events"
+        )
+        while device.requests["events"] == 0 or not device.connected_streams:
+            await asyncio.sleep(0.01)
+
+        start = time.perf_counter()
+        for index in range(events):
+            panel_id = panel_ids[index % len(panel_ids)]
+            device.push_event(4, [{"panelId": panel_id, "gesture": index % 2}])
+        await asyncio.wait_for(done.wait(), 60)
+        elapsed = time.perf_counter() - start
+        unsub()
+
+        # Touch to trigger latency: one gesture at a time from the moment the
+        # device sends it until a listener on the bus runs.
+        samples: list[float] = []
+        sent = 0.0
+        fired = asyncio.Event()
+
+        @callback
+        def trigger(_: Any) -> None:
+            samples.append(time.perf_counter() - sent)
+            fired.set()
+
+        unsub = hass.bus.async_listen(EVENT, trigger)
+        for index in range(min(events, 500)):
+            fired.clear()
+            sent = time.perf_counter()
+            device.push_event(4, [{"panelId": panel_ids[0], "gesture": index % 2}])
+            await asyncio.wait_for(fired.wait(), 5)
+        unsub()
+        stream.cancel()
+        return {
+            "events": events,
+            "seconds": round(elapsed, 4),
+            "events_per_second": round(events / elapsed),
+            "touch_to_trigger": percentiles(samples),
+            "controller_touch_latency": controller.stats.touch_latency.as_dict(),
+        }
+    finally:
+        await device.stop()
+
+
+def bench_render(
+    panel_counts: list[int], frames: int, repeats: int
+) -> list[dict[str, Any]]:
+    """Measure render_effect work on large layouts, per effect.
+
+    Times render and the custom_anim_data encoding separately, as the
+    service runs both on the executor before one upload.
+    """
+    colors = [(255, 0, 0), (0, 255, 0), (0, 0, 255)]
+    results = []
+    for panels in panel_counts:
+        position_data = triangle_layout(panels)
+        panel_ids = [
+            panel["panelId"]
+            for panel in position_data
+            if panel["shapeType"] != SHAPES_CONTROLLER
+        ]
+        for effect in EFFECTS:
+            render_times: list[float] = []
+            encode_times: list[float] = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                frames_rgb = render(
+                    effect, position_data, panel_ids, frames, colors, angle=30
+                )
+                render_times.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                anim_data = custom_anim_data(panel_ids, frames_rgb, 5)
+                encode_times.append(time.perf_counter() - start)
+            results.append(
+                {
+                    "panels": panels,
+                    "frames": frames,
+                    "effect": effect,
+                    "render": percentiles(render_times),
+                    "custom_anim_data": percentiles(encode_times),
+                    "anim_data_bytes": len(anim_data),
+                }
+            )
+    return results
+
+
+async def bench_streaming(hass: HomeAssistant, duration: float) -> dict[str, Any]:
+    """Measure the extControl frame rate and check the frames received."""
+    device = FakeNanoleaf(panels=30)
+    await device.start()
+    try:
+        controller = await connect(hass, device)
+        panel_ids = controller.framebuffer.panel_ids
+        await controller.async_start_streaming(device.udp_port)
+        updates = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < duration:
+            controller.stream_frame(
+                {panel_id: (updates % 256, 0, 255, 1) for panel_id in panel_ids}
+            )
+            updates += 1
+            await asyncio.sleep(0.002)
+        await asyncio.sleep(2 / controller.stream_fps)
+        controller.async_stop_streaming()
+        received = device.ext_control.frames
+        expected = (updates - 1) % 256
+        return {
+            "updates": updates,
+            "frames": len(received),
+            "frames_per_second": round(len(received) / duration, 1),
+            "max_fps": controller.stream_fps,
+            "decode_errors": len(device.ext_control.errors),
+            "last_frame_ok": bool(received)
+            and all(color[0] == expected for color in received[-1].values()),
+        }
+    finally:
+        await device.stop()
+
+
+async def bench_memory(hass: HomeAssistant, controllers: int) -> dict[str, Any]:
+    """Measure the memory held per controller with its info loaded."""
+    device = FakeNanoleaf(panels=30)
+    await device.start()
+    try:
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        kept = [await connect(hass, device) for _ in range(controllers)]
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+        return {
+            "controllers": len(kept),
+            "panels": 30,
+            "bytes_per_controller": size // controllers,
+        }
+    finally:
+        await device.stop()
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    """Run every benchmark."""
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        await hass.async_start()
+        try:
+            return {
+                "meta": {
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "cpus": os.cpu_count(),
+                    "latency_s": args.latency,
+                    "timestamp": time.time(),
+                },
+                "command_latency": await bench_command_latency(
+                    hass, args.iterations, args.latency
+                ),
+                "transport": await bench_transport(
+                    hass, args.iterations, args.latency, args.burst
+                ),
+                "stream_reader": await bench_stream_reader(
+                    hass, args.events, args.samples
+                ),
+                "scene_apply": await bench_scene_apply(
+                    hass, args.panel_counts, args.repeats, args.latency
+                ),
+                "multi_controller": await bench_multi_controller(
+                    hass, args.controller_latencies, args.repeats
+                ),
+                "touch_dispatch": await bench_touch_dispatch(hass, args.events),
+                "render": bench_render(
+                    args.render_sizes, args.render_frames, args.repeats
+                ),
+                "streaming": await bench_streaming(hass, args.stream_duration),
+                "memory": await bench_memory(hass, args.controllers),
+            }
+        finally:
+            await hass.async_stop(force=True)
+
+
+def main() -> None:
+    """Parse arguments, run the benchmarks and write the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--burst", type=int, default=50)
+    parser.add_argument(
+        "--panel-counts", type=int, nargs="+", default=[15, 30, 60, 120, 250, 500]
+    )
+    parser.add_argument(
+        "--controller-latencies", type=float, nargs="+", default=[0.01, 0.05, 0.12]
+    )
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--render-sizes", type=int, nargs="+", default=[500, 2000])
+    parser.add_argument("--render-frames", type=int, default=30)
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--controllers", type=int, default=20)
+    parser.add_argument("--stream-duration", type=float, default=2.0)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    text = json.dumps(results, indent=2)
+    if args.output is not None:
+        args.output.write_text(text + "\n", encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
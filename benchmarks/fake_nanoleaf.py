@@ -0,0 +1,389 @@
+"""Local stand-in for a Nanoleaf controller.
+
+Serves the parts of the OpenAPI used by the integration (token creation,
+device info, brightness, effects and the /events SSE stream), receives
+extControl v2 UDP frames and sends raw touch data to the port requested
+with the TouchEventsPort header. Latency, panel count and failures are
+configurable so the integration can be exercised without hardware.
+
+Run standalone with:
+
+    python benchmarks/fake_nanoleaf.py --panels 30 --latency 0.02
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections import Counter
+from collections.abc import Awaitable, Callable
+import json
+import logging
+import math
+import random
+import struct
+import time
+from typing import Any
+
+from aiohttp import web
+
+_LOGGER = logging.getLogger(__name__)
+
+MINI_TRIANGLE = 9
+SHAPES_CONTROLLER = 12
+SIDE_LENGTH = 67
+# Selected effect reported after a display write, by animType.
+DISPLAY_SELECT = {"static": "*Static*", "extControl": "*ExtControl*"}
+
+
+def triangle_layout(panels: int) -> list[dict[str, Any]]:
+    """Return positionData for a strip of mini triangles plus a controller."""
+    # Rows of alternating up/down triangles, as on a Shapes wall.
+    height = SIDE_LENGTH * math.sqrt(3) / 2
+    per_row = max(int(math.sqrt(panels) * 2), 2)
+    position_data = []
+    for index in range(panels):
+        row, column = divmod(index, per_row)
+        position_data.append(
+            {
+                "panelId": 1000 + index,
+                "x": round(column * SIDE_LENGTH / 2),
+                "y": round(row * height),
+                "o": 60 if (row + column) % 2 else 0,
+                "shapeType": MINI_TRIANGLE,
+            }
+        )
+    position_data.append(
+        {"panelId": 0, "x": 0, "y": 0, "o": 0, "shapeType": SHAPES_CONTROLLER}
+    )
+    return position_data
+
+
+class ExtControlReceiver(asyncio.DatagramProtocol):
+    """Receive and decode extControl v2 frames."""
+
+    def __init__(self, panel_ids: set[int]) -> None:
+        """Initialize the receiver."""
+        self.panel_ids = panel_ids
+        self.frames: list[dict[int, tuple[int, int, int, int, int]]] = []
+        self.errors: list[str] = []
+
+    def datagram_received(self, data: bytes, addr: tuple[str, int]) -> None:
+        """Decode a frame and check its encoding."""
+        if len(data) < 2:
+            self.errors.append(f"short frame {data.hex()}")
+            return
+        (count,) = struct.unpack_from(">H", data)
+        if len(data) != 2 + 8 * count:
+            self.errors.append(f"frame of {len(data)} bytes announces {count} panels")
+            return
+        frame = {}
+        for offset in range(2, len(data), 8):
+            panel_id, red, green, blue, white, transition = struct.unpack_from(
+                ">HBBBBH", data, offset
+            )
+            if panel_id not in self.panel_ids:
+                self.errors.append(f"unknown panel {panel_id}")
+            frame[panel_id] = (red, green, blue, white, transition)
+        self.frames.append(frame)
+
+
+class FakeNanoleaf:
+    """Fake Nanoleaf controller served over HTTP and UDP."""
+
+    def __init__(
+        self,
+        panels: int = 15,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        failure_rate: float = 0.0,
+        token: str = "fake-token",
+        seed: int | None = None,
+    ) -> None:
+        """Initialize the fake device."""
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.token = token
+        self.random = random.Random(seed)
+        self.requests: Counter[str] = Counter()
+        self.effect_writes: list[dict[str, Any]] = []
+        # Monotonic times at which displays, selects and brightness changes
+        # took effect.
+        self.applied_at: list[float] = []
+        self.effects: dict[str, dict[str, Any]] = {
+            "Northern Lights": {"animName": "Northern Lights", "animType": "random"}
+        }
+        self.info: dict[str, Any] = {
+            "name": "Shapes FAKE",
+            "serialNo": "S00000FAKE",
+            "manufacturer": "Nanoleaf",
+            "firmwareVersion": "9.2.4",
+            "hardwareVersion": "1.3-0",
+            "model": "NL42",
+            "effects": {"effectsList": list(self.effects), "select": "Northern Lights"},
+            "panelLayout": {
+                "globalOrientation": {"value": 0, "max": 360, "min": 0},
+                "layout": {
+                    "numPanels": panels + 1,
+                    "sideLength": SIDE_LENGTH,
+                    "positionData": triangle_layout(panels),
+                },
+            },
+            "state": {
+                "brightness": {"value": 100, "max": 100, "min": 0},
+                "colorMode": "effect",
+                "ct": {"value": 4000, "max": 6500, "min": 1200},
+                "hue": {"value": 0, "max": 360, "min": 0},
+                "on": {"value": True},
+                "sat": {"value": 0, "max": 100, "min": 0},
+            },
+        }
+        self.panel_ids = {
+            panel["panelId"]
+            for panel in self.info["panelLayout"]["layout"]["positionData"]
+            if panel["shapeType"] == MINI_TRIANGLE
+        }
+        self.ext_control = ExtControlReceiver(self.panel_ids)
+        self._streams: list[asyncio.Queue[str | None]] = []
+        # Addresses raw touch data is sent to, one per open event stream.
+        self.touch_targets: list[tuple[str, int]] = []
+        self._runner: web.AppRunner | None = None
+        self._udp_transport: asyncio.DatagramTransport | None = None
+        self.netloc = ""
+        self.udp_port = 0
+
+    @property
+    def app(self) -> web.Application:
+        """Return the web application of the fake device."""
+        app = web.Application(middlewares=[self._latency_middleware])
+        app.router.add_post("/api/v1/new", self._new_token)
+        app.router.add_get("/api/v1/{token}", self._get_info)
+        app.router.add_put("/api/v1/{token}/state", self._put_state)
+        app.router.add_put("/api/v1/{token}/state/brightness", self._put_brightness)
+        app.router.add_put("/api/v1/{token}/effects", self._put_effects)
+        app.router.add_get("/api/v1/{token}/events", self._get_events)
+        return app
+
+    @property
+    def connected_streams(self) -> int:
+        """Return the number of open event streams."""
+        return len(self._streams)
+
+    @property
+    def queued_messages(self) -> int:
+        """Return the number of messages not yet sent on the event streams."""
+        return sum(queue.qsize() for queue in self._streams)
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving and return the netloc of the device."""
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        sockets = site._server.sockets  # pylint: disable=protected-access
+        self.netloc = f"{host}:{sockets[0].getsockname()[1]}"
+        loop = asyncio.get_running_loop()
+        self._udp_transport, _ = await loop.create_datagram_endpoint(
+            lambda: self.ext_control, local_addr=(host, 0)
+        )
+        self.udp_port = self._udp_transport.get_extra_info("sockname")[1]
+        return self.netloc
+
+    async def stop(self) -> None:
+        """Stop serving."""
+        self.drop_streams()
+        if self._udp_transport is not None:
+            self._udp_transport.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def push_event(self, channel: int, events: list[dict[str, Any]]) -> None:
+        """Send an event to every open event stream."""
+        message = f"id: {channel}\ndata: {json.dumps({'events': events})}\n\n"
+        for queue in self._streams:
+            queue.put_nowait(message)
+
+    def push_sse_line(self, line: str) -> None:
+        """Send one raw line to every open event stream."""
+        for queue in self._streams:
+            queue.put_nowait(f"{line}\n")
+
+    def load_info(self, info: dict[str, Any]) -> None:
+        """Take over the info and panels of another device."""
+        self.info = {**self.info, **info}
+        self.panel_ids = {
+            panel["panelId"]
+            for panel in self.info["panelLayout"]["layout"]["positionData"]
+            if panel["shapeType"] == MINI_TRIANGLE
+        }
+        self.ext_control.panel_ids = self.panel_ids
+
+    def push_touch(self, touches: list[tuple[int, int, int | None]]) -> None:
+        """Send panelId, touch type and swiped from panelId as raw touch data."""
+        packet = bytearray(struct.pack(">H", len(touches)))
+        for panel_id, touch_type, swiped_from in touches:
+            packet += struct.pack(
+                ">HBH",
+                panel_id,
+                touch_type << 4,
+                0xFFFF if swiped_from is None else swiped_from,
+            )
+        assert self._udp_transport is not None
+        for target in self.touch_targets:
+            self._udp_transport.sendto(bytes(packet), target)
+
+    def drop_streams(self) -> None:
+        """Close every open event stream, as a controller reboot would."""
+        for queue in self._streams:
+            queue.put_nowait(None)
+
+    @web.middleware
+    async def _latency_middleware(
+        self, request: web.Request, handler: Callable[[web.Request], Awaitable[Any]]
+    ) -> web.StreamResponse:
+        """Delay a request by the latency, half on the way in, half on the way out.
+
+        Writes are applied in between, as on a device at the far end of a
+        symmetric link.
+        """
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay / 2)
+        response = await handler(request)
+        if delay:
+            await asyncio.sleep(delay / 2)
+        return response
+
+    async def _respond(
+        self, request: web.Request, endpoint: str
+    ) -> web.Response | None:
+        """Count the request and apply failure injection."""
+        self.requests[endpoint] += 1
+        if self.failure_rate and self.random.random() < self.failure_rate:
+            return web.Response(status=500)
+        if "token" in request.match_info and request.match_info["token"] != self.token:
+            return web.Response(status=401)
+        return None
+
+    async def _new_token(self, request: web.Request) -> web.Response:
+        """Handle POST /api/v1/new."""
+        if (error := await self._respond(request, "new")) is not None:
+            return error
+        return web.json_response({"auth_token": self.token})
+
+    async def _get_info(self, request: web.Request) -> web.Response:
+        """Handle GET /api/v1/{token}."""
+        if (error := await self._respond(request, "info")) is not None:
+            return error
+        return web.json_response(self.info)
+
+    async def _put_state(self, request: web.Request) -> web.Response:
+        """Handle PUT /api/v1/{token}/state."""
+        if (error := await self._respond(request, "state")) is not None:
+            return error
+        body = await request.json(loads=json.loads)
+        if "on" in body:
+            self.info["state"]["on"]["value"] = body["on"]["value"]
+            self.push_event(1, [{"attr": 1, "value": body["on"]["value"]}])
+        return web.Response(status=204)
+
+    async def _put_brightness(self, request: web.Request) -> web.Response:
+        """Handle PUT /api/v1/{token}/state/brightness."""
+        if (error := await self._respond(request, "brightness")) is not None:
+            return error
+        body = await request.json(loads=json.loads)
+        value = body["brightness"]["value"]
+        self.applied_at.append(time.monotonic())
+        self.info["state"]["brightness"]["value"] = value
+        self.push_event(1, [{"attr": 2, "value": value}])
+        return web.Response(status=204)
+
+    async def _put_effects(self, request: web.Request) -> web.Response:
+        """Handle PUT /api/v1/{token}/effects."""
+        if (error := await self._respond(request, "effects")) is not None:
+            return error
+        body = await request.json(loads=json.loads)
+        if "select" in body:
+            if body["select"] not in self.effects:
+                return web.Response(status=404)
+            self.info["effects"]["select"] = body["select"]
+            self.applied_at.append(time.monotonic())
+            self.push_event(3, [{"attr": 1, "value": body["select"]}])
+            return web.Response(status=204)
+
+        write = body["write"]
+        self.effect_writes.append(write)
+        command = write["command"]
+        if command == "display":
+            self.applied_at.append(time.monotonic())
+            # The device reports displayed effects under placeholder names.
+            select = DISPLAY_SELECT.get(write.get("animType"), "*Dynamic*")
+            self.info["effects"]["select"] = select
+            self.push_event(3, [{"attr": 1, "value": select}])
+        if command == "add":
+            self.effects[write["animName"]] = write
+        elif command == "delete":
+            if self.effects.pop(write["animName"], None) is None:
+                return web.Response(status=404)
+        elif command == "request":
+            if (effect := self.effects.get(write["animName"])) is None:
+                return web.Response(status=404)
+            return web.json_response(effect)
+        elif command == "requestAll":
+            return web.json_response({"animations": list(self.effects.values())})
+        self.info["effects"]["effectsList"] = list(self.effects)
+        return web.Response(status=204)
+
+    async def _get_events(self, request: web.Request) -> web.StreamResponse:
+        """Handle GET /api/v1/{token}/events as a server-sent event stream."""
+        if (error := await self._respond(request, "events")) is not None:
+            return error
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        queue: asyncio.Queue[str | None] = asyncio.Queue()
+        self._streams.append(queue)
+        target = None
+        if (port := request.headers.get("TouchEventsPort")) is not None:
+            target = (request.remote or "127.0.0.1", int(port))
+            self.touch_targets.append(target)
+        try:
+            while (message := await queue.get()) is not None:
+                await response.write(message.encode("utf-8"))
+        finally:
+            self._streams.remove(queue)
+            if target is not None:
+                self.touch_targets.remove(target)
+        return response
+
+
+async def _main(args: argparse.Namespace) -> None:
+    """Serve a fake device until interrupted."""
+    device = FakeNanoleaf(
+        panels=args.panels,
+        latency=args.latency,
+        failure_rate=args.failure_rate,
+        token=args.token,
+    )
+    netloc = await device.start(args.host, args.port)
+    _LOGGER.warning(
+        "Fake Nanoleaf on %s (token %s, extControl UDP port %s)",
+        netloc,
+        device.token,
+        device.udp_port,
+    )
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await device.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=16021)
+    parser.add_argument("--panels", type=int, default=15)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--token", default="fake-token")
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(parser.parse_args()))
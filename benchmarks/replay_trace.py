@@ -0,0 +1,163 @@
+"""Replay a recorded trace through NanoleafController against a fake device.
+
+Traces are recorded with the nanoleaf_panels.record_trace service. The fake
+device takes over the recorded device info and sends the recorded event
+stream lines and touches back to the controller, which dispatches them as
+it would live, while the recorded commands go out through its request
+layer. Prints dispatch lag, gestures fired and the controller statistics
+as JSON:
+
+    python benchmarks/replay_trace.py trace.jsonl.gz --speed 10
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections import Counter
+import cProfile
+import json
+from pathlib import Path
+import sys
+import tempfile
+import time
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from homeassistant.core import HomeAssistant, callback  # noqa: E402
+
+from benchmarks.bench_controller import percentiles  # noqa: E402
+from benchmarks.fake_nanoleaf import FakeNanoleaf  # noqa: E402
+from custom_components.nanoleaf_panels.const import EVENT  # noqa: E402
+from custom_components.nanoleaf_panels.nanoleaf_controller import (  # noqa: E402
+    NanoleafController,
+)
+from custom_components.nanoleaf_panels.trace import (  # noqa: E402
+    TRACE_COMMAND,
+    TRACE_INFO,
+    TRACE_SSE,
+    TRACE_TOKEN,
+    TRACE_TOUCH,
+    read_trace,
+)
+
+
+async def replay(
+    hass: HomeAssistant, records: list[dict[str, Any]], speed: float
+) -> dict[str, Any]:
+    """Replay trace records at speed times real time, 0 for no pacing."""
+    device = FakeNanoleaf()
+    for record in records:
+        if record.get(TRACE_INFO):
+            device.load_info(record[TRACE_INFO])
+            break
+    await device.start()
+    try:
+        controller = NanoleafController(hass, device.netloc, device.token)
+        await controller.get_info()
+        # No entity registry here, so fill the panel index it would build.
+        controller._panel_entities = {  # pylint: disable=protected-access
+            str(panel_id): ("device", f"light.panel_{panel_id}")
+            for panel_id in device.panel_ids
+        }
+        if any(TRACE_TOUCH in record for record in records):
+            await controller.async_start_touch_stream()
+        fired: Counter[str] = Counter()
+
+        @callback
+        def count(event: Any) -> None:
+            fired[event.data["type"]] += 1
+
+        unsub = hass.bus.async_listen(EVENT, count)
+        stream = hass.async_create_background_task(
+            controller.async_process_events_stream(), "replay events"
+        )
+        while not device.connected_streams:
+            await asyncio.sleep(0.01)
+
+        kinds: Counter[str] = Counter()
+        lags: list[float] = []
+        commands = []
+        start = time.perf_counter()
+        for record in records:
+            if speed:
+                due = start + record["t"] / speed
+                if (delay := due - time.perf_counter()) > 0:
+                    await asyncio.sleep(delay)
+                lags.append(max(time.perf_counter() - due, 0))
+            if TRACE_SSE in record:
+                device.push_sse_line(record[TRACE_SSE])
+            elif TRACE_TOUCH in record:
+                device.push_touch([tuple(touch) for touch in record[TRACE_TOUCH]])
+            elif TRACE_COMMAND in record:
+                method, path, payload = record[TRACE_COMMAND]
+                commands.append(
+                    hass.async_create_task(
+                        controller._request(  # pylint: disable=protected-access
+                            method, path.replace(TRACE_TOKEN, device.token), payload
+                        )
+                    )
+                )
+            else:
+                continue
+            kinds[next(key for key in record if key != "t")] += 1
+        await asyncio.gather(*commands)
+        # Let the stream and the loop work off what is still queued.
+        while device.queued_messages:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.1)
+        elapsed = time.perf_counter() - start
+
+        unsub()
+        stream.cancel()
+        controller.async_stop_touch_stream()
+        return {
+            "records": dict(kinds),
+            "trace_seconds": records[-1]["t"] if records else 0,
+            "replay_seconds": round(elapsed, 4),
+            "speed": speed,
+            "lag": percentiles(lags) if lags else None,
+            "gestures_fired": dict(fired),
+            "stats": controller.stats.as_dict(),
+        }
+    finally:
+        await device.stop()
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    """Replay the trace in a bare Home Assistant instance."""
+    records = read_trace(args.trace)
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        await hass.async_start()
+        try:
+            return await replay(hass, records, args.speed)
+        finally:
+            await hass.async_stop(force=True)
+
+
+def main() -> None:
+    """Parse arguments, replay the trace and write the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("trace", type=Path)
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--profile", type=Path, help="write cProfile stats here")
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    profiler = cProfile.Profile() if args.profile is not None else None
+    if profiler is not None:
+        profiler.enable()
+    results = asyncio.run(run(args))
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+
+    text = json.dumps(results, indent=2)
+    if args.output is not None:
+        args.output.write_text(text + "\n", encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
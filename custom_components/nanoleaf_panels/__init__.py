@@ -4,11 +4,32 @@ from __future__ import annotations
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import CONF_HOST, CONF_TOKEN, Platform
 from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.typing import ConfigType
 
-from .const import DOMAIN
+from .const import (
+    CONF_STREAM_IDLE_TIMEOUT,
+    CONF_TOUCH_STREAM,
+    DEFAULT_STREAM_IDLE_TIMEOUT,
+    DOMAIN,
+    EVENT_HUB,
+    STORAGE_VERSION,
+)
+from .event_hub import EventHub
 from .nanoleaf_controller import NanoleafController
+from .services import async_setup_services
 
-PLATFORMS: list[Platform] = [Platform.LIGHT]
+PLATFORMS: list[Platform] = [Platform.LIGHT, Platform.SENSOR]
+
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Set up the Nanoleaf Panels services."""
+    async_setup_services(hass)
+    return True
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
@@ -18,18 +39,64 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         hass,
         entry.data[CONF_HOST],
         entry.data[CONF_TOKEN],
+        store=Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}"),
+        stream_idle_timeout=entry.options.get(
+            CONF_STREAM_IDLE_TIMEOUT, DEFAULT_STREAM_IDLE_TIMEOUT
+        ),
+    )
+
+    # Start from the last known snapshot so startup does not wait on the device.
+    if await nanoleaf_controller.async_load_snapshot():
+        entry.async_create_background_task(
+            hass,
+            nanoleaf_controller.async_refresh(),
+            f"{DOMAIN} refresh {entry.title}",
+        )
+    elif await nanoleaf_controller.get_info() is None:
+        raise ConfigEntryNotReady(f"Unable to connect to {entry.data[CONF_HOST]}")
+    entry.async_create_background_task(
+        hass,
+        nanoleaf_controller.async_refresh_effects(),
+        f"{DOMAIN} effects {entry.title}",
     )
-    hass.data.setdefault(DOMAIN, {})[entry.entry_id] = nanoleaf_controller
+
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    domain_data[entry.entry_id] = nanoleaf_controller
+    if EVENT_HUB not in domain_data:
+        domain_data[EVENT_HUB] = EventHub(hass)
 
     # hass.config_entries.async_setup_platforms(entry, PLATFORMS)
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
+    entry.async_on_unload(
+        nanoleaf_controller.async_track_panel_entities(entry.entry_id)
+    )
+    entry.async_on_unload(nanoleaf_controller.async_track_availability())
+    if entry.options.get(CONF_TOUCH_STREAM):
+        await nanoleaf_controller.async_start_touch_stream()
+        entry.async_on_unload(nanoleaf_controller.async_stop_touch_stream)
+    entry.async_on_unload(nanoleaf_controller.async_stop_recording)
+    entry.async_on_unload(nanoleaf_controller.async_shutdown)
+    domain_data[EVENT_HUB].async_register(entry.entry_id, nanoleaf_controller)
+    entry.async_on_unload(entry.add_update_listener(async_update_options))
+
     return True
 
 
+async def async_update_options(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload a config entry when its options change."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
+        hass.data[DOMAIN][EVENT_HUB].async_unregister(entry.entry_id)
         hass.data[DOMAIN].pop(entry.entry_id)
 
     return unload_ok
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the stored device snapshot of a config entry."""
+    await Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}").async_remove()
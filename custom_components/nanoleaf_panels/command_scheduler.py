@@ -0,0 +1,78 @@
+"""Latest-wins scheduling of commands sent to a device."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+
+
+@dataclass
+class _Target:
+    """Pending and in-flight command of one target."""
+
+    command: Callable[[], Awaitable[Any]] | None = None
+    future: asyncio.Future | None = None
+    task: asyncio.Task | None = None
+
+
+class CommandScheduler:
+    """Send at most one command per target at a time, latest wins.
+
+    A command submitted while another one for the same target is pending
+    replaces it; every caller waiting on the replaced command gets the result
+    of the command that is actually sent.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the scheduler."""
+        self.hass = hass
+        self._targets: dict[str, _Target] = {}
+
+    @property
+    def in_flight(self) -> int:
+        """Return the number of targets with a command being sent."""
+        return sum(target.task is not None for target in self._targets.values())
+
+    @property
+    def queued(self) -> int:
+        """Return the number of targets with a command waiting to be sent."""
+        return sum(target.command is not None for target in self._targets.values())
+
+    async def async_submit(
+        self,
+        target: str,
+        command: Callable[[], Awaitable[Any]],
+        delay: float = 0,
+    ) -> Any:
+        """Schedule a command and wait for the result of the latest one sent.
+
+        When the target is idle the command is sent after delay seconds, which
+        lets later submissions replace it before anything goes out.
+        """
+        state = self._targets.setdefault(target, _Target())
+        state.command = command
+        if state.future is None:
+            state.future = self.hass.loop.create_future()
+        future = state.future
+        if state.task is None:
+            state.task = self.hass.async_create_task(self._async_run(state, delay))
+        return await asyncio.shield(future)
+
+    async def _async_run(self, state: _Target, delay: float) -> None:
+        """Send pending commands of a target one after another."""
+        try:
+            if delay:
+                await asyncio.sleep(delay)
+            while state.command is not None and state.future is not None:
+                command, future = state.command, state.future
+                state.command = None
+                state.future = None
+                try:
+                    future.set_result(await command())
+                except Exception as err:  # pylint: disable=broad-except
+                    future.set_exception(err)
+        finally:
+            state.task = None
@@ -1,6 +1,7 @@
 """Config flow for Nanoleaf Panels integration."""
 from __future__ import annotations
 
+import asyncio
 import logging
 from typing import Any
 from urllib.parse import urlparse
@@ -13,10 +14,17 @@ from homeassistant import config_entries
 # from homeassistant.components.zeroconf import ZeroconfServiceInfo
 from homeassistant.components import ssdp, zeroconf
 from homeassistant.const import CONF_HOST, CONF_TOKEN
-from homeassistant.core import HomeAssistant
-from homeassistant.data_entry_flow import FlowResult
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.data_entry_flow import AbortFlow, FlowResult
 
-from .const import DOMAIN
+from .const import (
+    API_PORT,
+    CONF_STREAM_IDLE_TIMEOUT,
+    CONF_TOUCH_STREAM,
+    DEFAULT_STREAM_IDLE_TIMEOUT,
+    DOMAIN,
+)
+from .discovery import async_get_discovery_cache
 from .nanoleaf_controller import NanoleafController
 
 _LOGGER = logging.getLogger(__name__)
@@ -35,7 +43,7 @@ async def validate_input(hass: HomeAssistant, data: dict[str, Any]) -> str:
     if user_input:
         parts = user_input.split(":")
         host = parts[0]
-        port = 16021
+        port = API_PORT
         if len(parts) > 1 and parts[1]:
             port = parts[1]
         return f"{host}:{port}"
@@ -51,6 +59,16 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     def __init__(self) -> None:
         """Initialize config flow."""
         self.nanoleaf_controller: NanoleafController = NanoleafController(self.hass)
+        # Device id of a discovered device, its state is in the discovery cache.
+        self._device_id: str | None = None
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(
+        config_entry: config_entries.ConfigEntry,
+    ) -> OptionsFlowHandler:
+        """Get the options flow for this handler."""
+        return OptionsFlowHandler(config_entry)
 
     # 2023-12-12 20:30:16.273 INFO (MainThread) [custom_components.nanoleaf_panels.config_flow] X async_step_ssdp: SsdpServiceInfo(
     # ssdp_usn='uuid:3d703f8a-0160-44fc-a77e-4404cda23136',
@@ -85,16 +103,14 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     # x_homeassistant_matching_domains={'nanoleaf_panels', 'nanoleaf'})
     async def async_step_ssdp(self, discovery_info: ssdp.SsdpServiceInfo) -> FlowResult:
         """Handle a flow initialized by SSDP discovery."""
-        _LOGGER.info("X async_step_ssdp: %s", discovery_info)
-        netloc = str(urlparse(discovery_info.ssdp_location).netloc)
+        _LOGGER.debug("async_step_ssdp: %s", discovery_info)
+        location = urlparse(discovery_info.ssdp_location)
         # host = discovery_info.ssdp_headers["_host"]  # '192.168.1.23'
         name = discovery_info.ssdp_headers["nl-devicename"]  # 'Shapes 07E7'
         device_id = discovery_info.ssdp_headers["nl-deviceid"]  # '1A:25:70:12:4F:A6'
-        _LOGGER.info("X netloc: %s name: %s id: %s", netloc, name, device_id)
-        await self.async_set_unique_id(name)
-        self._abort_if_unique_id_configured()
-        self.nanoleaf_controller = NanoleafController(self.hass, netloc)
-        return await self.async_step_link()
+        return await self._async_step_discovered(
+            device_id, name, str(location.hostname), location.port, "ssdp"
+        )
 
     # 2023-12-12 20:30:07.951 INFO (MainThread) [custom_components.nanoleaf_panels.config_flow] X async_step_zeroconf: ZeroconfServiceInfo(ip_address=IPv4Address('192.168.1.23'), ip_addresses=[IPv4Address('192.168.1.23'), IPv6Address('fdd0:ee30:5608:c35a:255:daff:fe5e:7e7'), IPv6Address('fe80::255:daff:fe5e:7e7')], port=16021, hostname='Shapes-07E7.local.', type='_nanoleafapi._tcp.local.', name='Shapes 07E7._nanoleafapi._tcp.local.', properties={'srcvers': '9.2.4', 'md': 'NL42', 'id': '1A:25:70:12:4F:A6'})
     # 2023-12-12 20:30:07.967 INFO (MainThread) [custom_components.nanoleaf_panels.config_flow] X async_step_zeroconf: ZeroconfServiceInfo(ip_address=IPv4Address('192.168.1.23'), ip_addresses=[IPv4Address('192.168.1.23'), IPv6Address('fdd0:ee30:5608:c35a:255:daff:fe5e:7e7'), IPv6Address('fe80::255:daff:fe5e:7e7')], port=6517, hostname='Shapes-07E7.local.', type='_nanoleafms._tcp.local.', name='Shapes 07E7._nanoleafms._tcp.local.', properties={'sf': '1', 'sh': 'oopLKA==', 'pv': '1.1', 'ci': '5', 's#': '1', 'c#': '12', 'ff': '1', 'md': 'NL42', 'id': '1A:25:70:12:4F:A6'})
@@ -111,19 +127,48 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         self, discovery_info: zeroconf.ZeroconfServiceInfo
     ) -> FlowResult:
         """Handle a flow initialized by Zeroconf discovery."""
-        _LOGGER.info("X async_step_zeroconf: %s", discovery_info)
+        _LOGGER.debug("async_step_zeroconf: %s", discovery_info)
         host = str(discovery_info.ip_address)
-        netloc = f"{host}:16021"
         name = discovery_info.name.split(".")[
             0
         ]  # 'Shapes 07E7._nanoleafms._tcp.local.'
         device_id = discovery_info.properties["id"]  # '1A:25:70:12:4F:A6'
-        _LOGGER.info("X netloc: %s name: %s id: %s", netloc, name, device_id)
+        # Only _nanoleafapi announces the port of the OpenAPI.
+        port = discovery_info.port if "_nanoleafapi" in discovery_info.type else None
+        return await self._async_step_discovered(
+            device_id, name, host, port, discovery_info.type
+        )
+
+    async def _async_step_discovered(
+        self, device_id: str, name: str, host: str, port: int | None, source: str
+    ) -> FlowResult:
+        """Merge an announcement into the one pending flow of its device.
+
+        The first announcement of a device starts the flow; later ones only
+        refresh the address the flow will use and then abort as in progress.
+        """
+        cache = async_get_discovery_cache(self.hass)
+        device = cache.async_merge(device_id, name, host, port, source)
         await self.async_set_unique_id(name)
-        self._abort_if_unique_id_configured()
-        self.nanoleaf_controller = NanoleafController(self.hass, netloc)
+        try:
+            self._abort_if_unique_id_configured(updates={CONF_HOST: device.netloc})
+        except AbortFlow:
+            cache.async_remove(device_id)
+            raise
+
+        device.flow_id = self.flow_id
+        self._device_id = device_id
+        self.context["title_placeholders"] = {"name": name}
         return await self.async_step_link()
 
+    @callback
+    def async_remove(self) -> None:
+        """Release the discovered device when the flow ends."""
+        if self._device_id is not None:
+            async_get_discovery_cache(self.hass).async_remove(
+                self._device_id, self.flow_id
+            )
+
     async def async_step_user(
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
@@ -149,12 +194,39 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     async def async_step_link(
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
-        """Handle Nanoleaf link step."""
+        """Handle Nanoleaf link step.
+
+        Linking a discovered device also asks every other discovered device
+        for a token, and finishes the flows of those whose button was held
+        too, so a batch of controllers is onboarded in one go.
+        """
         if user_input is None:
             return self.async_show_form(step_id="link")
 
+        token = None
+        if self._device_id is not None:
+            cache = async_get_discovery_cache(self.hass)
+            device = cache.devices[self._device_id]
+            self.nanoleaf_controller = NanoleafController(
+                self.hass, device.netloc, device.token
+            )
+            token = device.token
+            if token is None:
+                token, linked = await asyncio.gather(
+                    self.nanoleaf_controller.new_token(),
+                    cache.async_link_pending(self._device_id),
+                )
+                for other in linked:
+                    assert other.flow_id is not None
+                    self.hass.async_create_task(
+                        self.hass.config_entries.flow.async_configure(
+                            other.flow_id, {}
+                        )
+                    )
+        else:
+            token = await self.nanoleaf_controller.new_token()
+
         info = None
-        token = await self.nanoleaf_controller.new_token()
         if token is not None:
             info = await self.nanoleaf_controller.get_info()
 
@@ -170,3 +242,38 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             )
 
         return self.async_show_form(step_id="link", errors={"base": "unknown"})
+
+
+class OptionsFlowHandler(config_entries.OptionsFlow):
+    """Handle Nanoleaf Panels options."""
+
+    def __init__(self, config_entry: config_entries.ConfigEntry) -> None:
+        """Initialize options flow."""
+        self.config_entry = config_entry
+
+    async def async_step_init(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Manage the options."""
+        if user_input is not None:
+            return self.async_create_entry(title="", data=user_input)
+
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(
+                        CONF_TOUCH_STREAM,
+                        default=self.config_entry.options.get(
+                            CONF_TOUCH_STREAM, False
+                        ),
+                    ): bool,
+                    vol.Required(
+                        CONF_STREAM_IDLE_TIMEOUT,
+                        default=self.config_entry.options.get(
+                            CONF_STREAM_IDLE_TIMEOUT, DEFAULT_STREAM_IDLE_TIMEOUT
+                        ),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0, max=3600)),
+                }
+            ),
+        )
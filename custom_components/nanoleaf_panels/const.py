@@ -2,3 +2,65 @@
 
 DOMAIN = "nanoleaf_panels"
 EVENT = f"{DOMAIN}_event"
+# Keys of the shared event hub and discovery cache in hass.data[DOMAIN].
+EVENT_HUB = "event_hub"
+DISCOVERY = "discovery"
+# Port of the OpenAPI of a device.
+API_PORT = 16021
+
+# Per-request timeout in seconds for commands sent to the device, and the
+# shorter time to connect after which an unreachable device fails fast.
+REQUEST_TIMEOUT = 5
+CONNECT_TIMEOUT = 2
+# Maximum number of concurrent HTTP requests per device.
+MAX_CONCURRENT_REQUESTS = 2
+# Seconds to gather panel colour changes before writing them as one frame.
+DEFAULT_BATCH_WINDOW = 0.05
+# Panel shape types that are exposed as individual lights.
+LIGHT_SHAPE_TYPES = {9}
+# UDP port and maximum frame rate of the extControl v2 streaming mode.
+EXT_CONTROL_PORT = 60222
+DEFAULT_STREAM_FPS = 30
+# Longest panel transition in tenths of a second, the 16-bit field of a frame.
+MAX_TRANSITION = 65535
+
+# Version of the stored device snapshot and delay before it is written.
+STORAGE_VERSION = 1
+SNAPSHOT_SAVE_DELAY = 10
+# Device information kept in the snapshot.
+SNAPSHOT_KEYS = (
+    "name",
+    "serialNo",
+    "manufacturer",
+    "firmwareVersion",
+    "hardwareVersion",
+    "model",
+    "effects",
+    "panelLayout",
+    "state",
+)
+# Reconnect delay of the event stream, doubled after every failed attempt.
+RECONNECT_DELAY = 1
+MAX_RECONNECT_DELAY = 300
+# Seconds without data after which the event stream is reopened, 0 for never.
+# Devices send nothing while the wall is quiet, so it is opt-in.
+CONF_STREAM_IDLE_TIMEOUT = "stream_idle_timeout"
+DEFAULT_STREAM_IDLE_TIMEOUT = 0
+# Panels whose latest colour is kept while the device is unavailable.
+MAX_WRITE_BEHIND = 256
+# Effects installed on the device by the effect cache.
+CACHED_EFFECT_PREFIX = "HA "
+CACHED_EFFECTS_KEY = "cachedEffects"
+MAX_CACHED_EFFECTS = 10
+# Options of the raw touch data stream, sent by the device over UDP.
+CONF_TOUCH_STREAM = "touch_stream"
+TOUCH_EVENTS_PORT_HEADER = "TouchEventsPort"
+# Seconds a panel is held before long_press, between hold repeats, before a
+# held panel is released if its touch up got lost, and between leaving one
+# panel and touching its neighbour for the move to count as a swipe.
+LONG_PRESS_TIME = 0.5
+HOLD_INTERVAL = 0.5
+MAX_HOLD_TIME = 30
+SWIPE_WINDOW = 0.3
+# Seconds between writes of buffered trace records.
+TRACE_FLUSH_INTERVAL = 1
@@ -0,0 +1,82 @@
+"""Time-aligned scene apply across several Nanoleaf controllers."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any
+
+from .nanoleaf_controller import NanoleafController
+
+_LOGGER = logging.getLogger(__name__)
+
+# Stats endpoints of frame and brightness writes.
+FRAME_ENDPOINT = "effects"
+BRIGHTNESS_ENDPOINT = "state/brightness"
+
+
+def _lead_times(
+    controllers: list[NanoleafController], endpoint: str
+) -> dict[NanoleafController, float]:
+    """Return how long to hold back the write to each controller.
+
+    A device applies a write about half a round trip after it is sent, so
+    writes to devices that answer faster wait for the difference to the
+    slowest one. Devices without measurements are treated as the slowest.
+    """
+    one_way = {
+        controller: (controller.stats.endpoint_latency(endpoint) or 0) / 2
+        for controller in controllers
+    }
+    slowest = max(one_way.values(), default=0)
+    return {
+        controller: slowest - latency if latency else 0
+        for controller, latency in one_way.items()
+    }
+
+
+async def async_apply_scene(
+    frames: dict[NanoleafController, dict[int, tuple[int, int, int, int]]],
+    brightness: float | None = None,
+    transition: float = 1,
+    cache: bool = False,
+) -> dict[str, Any]:
+    """Write the frames of several controllers so their transitions align.
+
+    The frames are resolved by the caller, so the only work left here is the
+    concurrent fan-out. Returns the time the whole scene took to apply and
+    the hold-back and result of every device.
+    """
+    start = time.monotonic()
+    controllers = list(frames)
+    frame_delays = _lead_times(controllers, FRAME_ENDPOINT)
+    writes = [
+        controller.async_set_panels(frame, cache, frame_delays[controller])
+        for controller, frame in frames.items()
+    ]
+    if brightness is not None:
+        brightness_delays = _lead_times(controllers, BRIGHTNESS_ENDPOINT)
+        writes.extend(
+            controller.set_brightness(
+                brightness, transition, brightness_delays[controller]
+            )
+            for controller in controllers
+        )
+    results = await asyncio.gather(*writes)
+    apply_time = time.monotonic() - start
+    _LOGGER.debug(
+        "Applied scene to %d controllers in %.3f s", len(controllers), apply_time
+    )
+
+    frame_results = results[: len(controllers)]
+    brightness_results = results[len(controllers) :] or [True] * len(controllers)
+    devices = {
+        (controller.info or {}).get("name", controller.netloc): {
+            "delay": round(frame_delays[controller], 4),
+            "success": bool(frame_ok) and brightness_ok is not None,
+        }
+        for controller, frame_ok, brightness_ok in zip(
+            controllers, frame_results, brightness_results, strict=True
+        )
+    }
+    return {"apply_time": round(apply_time, 4), "devices": devices}
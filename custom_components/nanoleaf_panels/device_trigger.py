@@ -19,9 +19,11 @@ from homeassistant.helpers import config_validation as cv, entity_registry
 from homeassistant.helpers.trigger import TriggerActionType, TriggerInfo
 from homeassistant.helpers.typing import ConfigType
 
-from .const import DOMAIN, EVENT
+from .const import CONF_TOUCH_STREAM, DOMAIN, EVENT
+from .touch import RAW_GESTURES
 
-TRIGGER_TYPES = {"single_tap", "double_tap"}
+GESTURE_TYPES = ("single_tap", "double_tap")
+TRIGGER_TYPES = {*GESTURE_TYPES, *RAW_GESTURES}
 
 TRIGGER_SCHEMA = DEVICE_TRIGGER_BASE_SCHEMA.extend(
     {
@@ -40,7 +42,10 @@ async def async_get_triggers(
 
     entities = entity_registry.async_entries_for_device(registry, device_id)
     for entity in entities:
-        if entity.device_id != device_id:
+        if entity.device_id != device_id or entity.domain != "light":
+            continue
+        # Only panels are touched, not the light of the whole device.
+        if not str(entity.unique_id).isdigit():
             continue
 
         base_trigger = {
@@ -49,8 +54,12 @@ async def async_get_triggers(
             CONF_DEVICE_ID: device_id,
             CONF_ENTITY_ID: entity.entity_id,
         }
-        triggers.append({**base_trigger, CONF_TYPE: "single_tap"})
-        triggers.append({**base_trigger, CONF_TYPE: "double_tap"})
+        types = GESTURE_TYPES
+        # Raw touch gestures are only reported with the touch stream enabled.
+        entry = hass.config_entries.async_get_entry(entity.config_entry_id or "")
+        if entry is not None and entry.options.get(CONF_TOUCH_STREAM):
+            types += RAW_GESTURES
+        triggers.extend({**base_trigger, CONF_TYPE: type_} for type_ in types)
 
     return triggers
 
@@ -0,0 +1,35 @@
+"""Diagnostics support for Nanoleaf Panels."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_TOKEN
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN, EVENT_HUB
+from .nanoleaf_controller import NanoleafController
+
+TO_REDACT = {CONF_TOKEN, "serialNo"}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    nanoleaf_controller: NanoleafController = hass.data[DOMAIN][entry.entry_id]
+    stream = hass.data[DOMAIN][EVENT_HUB].streams.get(entry.entry_id)
+
+    return {
+        "entry": async_redact_data(entry.as_dict(), TO_REDACT),
+        "info": async_redact_data(nanoleaf_controller.info, TO_REDACT),
+        "stats": nanoleaf_controller.stats.as_dict(),
+        "commands": {
+            "in_flight": nanoleaf_controller.commands_in_flight,
+            "queued": nanoleaf_controller.commands_queued,
+            "write_behind": nanoleaf_controller.write_behind,
+        },
+        "available": nanoleaf_controller.available,
+        "event_stream": stream.as_dict() if stream is not None else None,
+    }
@@ -0,0 +1,95 @@
+"""Discovery announcements merged per Nanoleaf device."""
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+
+from homeassistant.core import HomeAssistant, callback
+
+from .const import API_PORT, DISCOVERY, DOMAIN
+from .nanoleaf_controller import NanoleafController
+
+
+@dataclass
+class DiscoveredDevice:
+    """What SSDP and zeroconf announced about one device."""
+
+    device_id: str
+    name: str
+    host: str
+    port: int = API_PORT
+    sources: set[str] = field(default_factory=set)
+    # Flow onboarding the device and the token linked for it, if any.
+    flow_id: str | None = None
+    token: str | None = None
+
+    @property
+    def netloc(self) -> str:
+        """Return the address of the OpenAPI of the device."""
+        return f"{self.host}:{self.port}"
+
+
+class DiscoveryCache:
+    """Merge the many announcements of a device into one pending flow.
+
+    A controller announces itself over several SSDP search targets and
+    zeroconf service types. They are keyed by the device id they all carry,
+    so only the first starts a flow and later ones just refresh its address.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize an empty cache."""
+        self.hass = hass
+        self.devices: dict[str, DiscoveredDevice] = {}
+
+    @callback
+    def async_merge(
+        self, device_id: str, name: str, host: str, port: int | None, source: str
+    ) -> DiscoveredDevice:
+        """Merge an announcement, with port None unless it is the API's."""
+        if (device := self.devices.get(device_id)) is None:
+            device = self.devices[device_id] = DiscoveredDevice(device_id, name, host)
+        device.host = host
+        if port is not None:
+            device.port = port
+        device.sources.add(source)
+        return device
+
+    @callback
+    def async_remove(self, device_id: str, flow_id: str | None = None) -> None:
+        """Forget a device, or only if flow_id is still onboarding it."""
+        device = self.devices.get(device_id)
+        if device is not None and flow_id in (None, device.flow_id):
+            del self.devices[device_id]
+
+    async def async_link_pending(self, exclude: str) -> list[DiscoveredDevice]:
+        """Ask every other device waiting in a flow for a token at once.
+
+        Devices whose power button is not held refuse quickly, so linking a
+        whole batch takes about as long as linking one.
+        """
+        pending = [
+            device
+            for device in self.devices.values()
+            if device.device_id != exclude
+            and device.flow_id is not None
+            and device.token is None
+        ]
+        tokens = await asyncio.gather(
+            *(
+                NanoleafController(self.hass, device.netloc).new_token()
+                for device in pending
+            )
+        )
+        for device, token in zip(pending, tokens, strict=True):
+            device.token = token
+        return [device for device in pending if device.token is not None]
+
+
+@callback
+def async_get_discovery_cache(hass: HomeAssistant) -> DiscoveryCache:
+    """Return the discovery cache shared by all flows."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if DISCOVERY not in domain_data:
+        domain_data[DISCOVERY] = DiscoveryCache(hass)
+    return domain_data[DISCOVERY]
@@ -0,0 +1,128 @@
+"""Shared event stream hub for all Nanoleaf controllers."""
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+import logging
+import random
+from typing import Any
+
+import aiohttp
+
+from homeassistant.core import HomeAssistant, callback
+
+from .const import DOMAIN, MAX_RECONNECT_DELAY, RECONNECT_DELAY
+from .nanoleaf_controller import NanoleafController
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class DeviceStream:
+    """Event stream of one controller and its reconnect state."""
+
+    controller: NanoleafController
+    task: asyncio.Task | None = None
+    connected: bool = False
+    failures: int = 0
+    reconnects: int = 0
+    disconnected_at: float | None = None
+    last_outage: float | None = None
+    total_outage: float = 0.0
+    # Reopened after the idle timeout; not an outage unless reconnecting fails.
+    idle_timeouts: int = 0
+    idle: bool = False
+
+    @property
+    def reconnect_delay(self) -> float:
+        """Return the delay before the next connection attempt.
+
+        The delay grows exponentially with consecutive failures and is
+        jittered so that controllers that dropped together do not reconnect
+        in lockstep.
+        """
+        delay = min(RECONNECT_DELAY * 2**self.failures, MAX_RECONNECT_DELAY)
+        return delay * random.uniform(0.5, 1)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the reconnect statistics of the stream."""
+        return {
+            "connected": self.connected,
+            "failures": self.failures,
+            "reconnects": self.reconnects,
+            "last_outage": self.last_outage,
+            "total_outage": self.total_outage,
+            "idle_timeouts": self.idle_timeouts,
+        }
+
+
+class EventHub:
+    """Run the event streams of every controller on the event loop."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the hub."""
+        self.hass = hass
+        self.streams: dict[str, DeviceStream] = {}
+
+    @callback
+    def async_register(self, entry_id: str, controller: NanoleafController) -> None:
+        """Start listening to the event stream of a controller."""
+        self.async_unregister(entry_id)
+        stream = DeviceStream(controller)
+        stream.task = self.hass.async_create_background_task(
+            self._async_listen(stream), f"{DOMAIN} events {controller.netloc}"
+        )
+        self.streams[entry_id] = stream
+
+    @callback
+    def async_unregister(self, entry_id: str) -> None:
+        """Stop listening to the event stream of a controller."""
+        if (stream := self.streams.pop(entry_id, None)) is not None:
+            if stream.task is not None:
+                stream.task.cancel()
+
+    async def _async_listen(self, stream: DeviceStream) -> None:
+        """Keep the event stream of a controller open."""
+        controller = stream.controller
+
+        @callback
+        def async_connected() -> None:
+            """Record the end of an outage."""
+            now = self.hass.loop.time()
+            if stream.disconnected_at is not None and not (
+                stream.idle and stream.failures == 0
+            ):
+                stream.last_outage = now - stream.disconnected_at
+                stream.total_outage += stream.last_outage
+                stream.reconnects += 1
+            stream.disconnected_at = None
+            stream.idle = False
+            stream.connected = True
+            stream.failures = 0
+            controller.async_set_available(True)
+
+        while True:
+            try:
+                await controller.async_process_events_stream(async_connected)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as err:
+                if stream.connected and isinstance(err, asyncio.TimeoutError):
+                    # A quiet wall sends nothing for hours; that is no outage.
+                    stream.idle_timeouts += 1
+                    stream.idle = True
+                elif not stream.connected:
+                    stream.failures += 1
+                    if isinstance(
+                        err, (aiohttp.ClientConnectionError, asyncio.TimeoutError)
+                    ):
+                        controller.async_set_available(False)
+                _LOGGER.debug("Event stream of %s failed: %s", controller.netloc, err)
+            except Exception:  # pylint: disable=broad-except
+                # Anything else would end the stream of this device for good.
+                stream.failures += 1
+                _LOGGER.exception("Error in event stream of %s", controller.netloc)
+            if stream.connected:
+                stream.connected = False
+                stream.disconnected_at = self.hass.loop.time()
+            delay = stream.reconnect_delay
+            _LOGGER.debug("Reconnect to %s in %.1f s", controller.netloc, delay)
+            await asyncio.sleep(delay)
@@ -0,0 +1,131 @@
+"""Shadow state of the colour shown by every panel."""
+from __future__ import annotations
+
+from collections.abc import Iterable, Iterator
+import struct
+
+import numpy as np
+
+# extControl v2 frame: panel count, then id, R, G, B, W and transition per panel.
+EXT_CONTROL_HEADER = struct.Struct(">H")
+EXT_CONTROL_PANEL = struct.Struct(">HBBBBH")
+
+
+class Framebuffer:
+    """Compact record of the RGB colour and brightness of each panel.
+
+    Panels show their colour scaled by their own brightness, so panels dim
+    independently of each other and of the device brightness. The record is
+    only trusted while valid: until a frame has been written, and after
+    another effect took over the panels, every panel counts as changed.
+    """
+
+    def __init__(
+        self, panel_ids: Iterable[int], rgb: tuple[int, int, int] = (255, 255, 255)
+    ) -> None:
+        """Initialize every panel with the same colour at full brightness."""
+        self.panel_ids = list(panel_ids)
+        self._index = {panel_id: index for index, panel_id in enumerate(self.panel_ids)}
+        self._colors = bytearray(bytes(rgb) * len(self.panel_ids))
+        self._brightness = bytearray(b"\xff" * len(self.panel_ids))
+        # Array views sharing memory with the byte arrays above.
+        self._rgb = np.frombuffer(self._colors, dtype=np.uint8).reshape(-1, 3)
+        self._levels = np.frombuffer(self._brightness, dtype=np.uint8)
+        self.valid = False
+
+    def __contains__(self, panel_id: object) -> bool:
+        """Return True if the panel is part of the framebuffer."""
+        return panel_id in self._index
+
+    def __len__(self) -> int:
+        """Return the number of panels."""
+        return len(self.panel_ids)
+
+    def get(self, panel_id: int) -> tuple[int, int, int]:
+        """Return the colour of a panel."""
+        offset = self._index[panel_id] * 3
+        red, green, blue = self._colors[offset : offset + 3]
+        return (red, green, blue)
+
+    def get_brightness(self, panel_id: int) -> int:
+        """Return the brightness of a panel, from 0 to 255."""
+        return self._brightness[self._index[panel_id]]
+
+    def changes(
+        self,
+        frame: dict[int, tuple[int, int, int, int]],
+        brightness: dict[int, int] | None = None,
+    ) -> dict[int, tuple[int, int, int, int]]:
+        """Return the part of the frame that differs from the current state."""
+        if not self.valid:
+            return dict(frame)
+        brightness = brightness or {}
+        return {
+            panel_id: color
+            for panel_id, color in frame.items()
+            if panel_id not in self._index
+            or self.get(panel_id) != color[:3]
+            or brightness.get(panel_id, self.get_brightness(panel_id))
+            != self.get_brightness(panel_id)
+        }
+
+    def merged(
+        self,
+        changes: dict[int, tuple[int, int, int, int]],
+        brightness: dict[int, int] | None = None,
+    ) -> Iterator[tuple[int, tuple[int, int, int, int]]]:
+        """Yield the full frame as shown, with the changes applied on top.
+
+        Every colour is scaled by the brightness of its panel in one pass over
+        all panels.
+        """
+        rgb = self._rgb.astype(np.uint16)
+        levels = self._levels.astype(np.uint16)
+        for panel_id, color in changes.items():
+            if (index := self._index.get(panel_id)) is not None:
+                rgb[index] = color[:3]
+        for panel_id, level in (brightness or {}).items():
+            if (index := self._index.get(panel_id)) is not None:
+                levels[index] = level
+        shown = ((rgb * levels[:, np.newaxis] + 127) // 255).tolist()
+        for panel_id, (red, green, blue) in zip(self.panel_ids, shown, strict=True):
+            transition = changes[panel_id][3] if panel_id in changes else 0
+            yield panel_id, (red, green, blue, transition)
+        for panel_id, color in changes.items():
+            if panel_id not in self._index:
+                yield panel_id, color
+
+    def update(
+        self,
+        changes: dict[int, tuple[int, int, int, int]],
+        brightness: dict[int, int] | None = None,
+    ) -> None:
+        """Store the colours and brightness of panels written to the device."""
+        for panel_id, (red, green, blue, _) in changes.items():
+            if panel_id in self._index:
+                offset = self._index[panel_id] * 3
+                self._colors[offset : offset + 3] = bytes((red, green, blue))
+        for panel_id, level in (brightness or {}).items():
+            if panel_id in self._index:
+                self._brightness[self._index[panel_id]] = level
+
+    def pack_ext_control(self, transitions: dict[int, int]) -> bytes:
+        """Encode the given panels as an extControl v2 UDP frame."""
+        panels = [panel_id for panel_id in transitions if panel_id in self._index]
+        packet = bytearray(
+            EXT_CONTROL_HEADER.size + EXT_CONTROL_PANEL.size * len(panels)
+        )
+        EXT_CONTROL_HEADER.pack_into(packet, 0, len(panels))
+        offset = EXT_CONTROL_HEADER.size
+        for panel_id in panels:
+            index = self._index[panel_id]
+            level = self._brightness[index]
+            red, green, blue = (
+                (channel * level + 127) // 255
+                for channel in self._colors[index * 3 : index * 3 + 3]
+            )
+            EXT_CONTROL_PANEL.pack_into(
+                packet, offset, panel_id, red, green, blue, 0, transitions[panel_id]
+            )
+            offset += EXT_CONTROL_PANEL.size
+        return bytes(packet)
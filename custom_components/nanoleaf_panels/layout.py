@@ -0,0 +1,121 @@
+"""Panel adjacency graph and spatial index built from the panel layout."""
+from __future__ import annotations
+
+from collections import defaultdict
+from collections.abc import Iterator
+import math
+from typing import Any
+
+# Side length per shapeType, used when the layout reports no sideLength.
+SHAPE_SIDE_LENGTHS = {
+    0: 150,  # Triangle
+    2: 100,  # Square
+    3: 100,  # Control square master
+    4: 100,  # Control square passive
+    7: 67,  # Hexagon (Shapes)
+    8: 134,  # Triangle (Shapes)
+    9: 67,  # Mini triangle (Shapes)
+    14: 134,  # Elements hexagon
+    15: 58,  # Elements hexagon corner
+    17: 154,  # Lines
+    18: 154,  # Lines single zone
+}
+TRIANGLE_SHAPE_TYPES = {0, 8, 9}
+HEXAGON_SHAPE_TYPES = {7, 14}
+
+# Slack on the centre distance of two panels that share an edge.
+ADJACENCY_TOLERANCE = 0.15
+
+
+def _inradius(shape_type: int, side_length: float) -> float:
+    """Return the distance from the centre of a panel to its edges."""
+    if shape_type in TRIANGLE_SHAPE_TYPES:
+        return side_length / (2 * math.sqrt(3))
+    if shape_type in HEXAGON_SHAPE_TYPES:
+        return side_length * math.sqrt(3) / 2
+    return side_length / 2
+
+
+class PanelLayout:
+    """Adjacency graph and grid index of the panels of a layout.
+
+    Panels are bucketed into a uniform grid whose cells are about one panel
+    wide, so building the graph and answering nearest-panel and region
+    queries only looks at a handful of cells regardless of the layout size.
+    """
+
+    def __init__(self, layout: dict[str, Any]) -> None:
+        """Build the graph and the index."""
+        self.layout = layout
+        default_side = layout.get("sideLength") or 0
+        self.positions: dict[int, tuple[float, float]] = {}
+        self._radius: dict[int, float] = {}
+        for panel in layout["positionData"]:
+            side = default_side or SHAPE_SIDE_LENGTHS.get(panel["shapeType"], 0)
+            if side <= 0 or panel["shapeType"] not in SHAPE_SIDE_LENGTHS:
+                continue
+            self.positions[panel["panelId"]] = (panel["x"], panel["y"])
+            self._radius[panel["panelId"]] = _inradius(panel["shapeType"], side)
+
+        max_radius = max(self._radius.values(), default=1)
+        self._cell_size = 2 * max_radius * (1 + ADJACENCY_TOLERANCE)
+        self._grid: dict[tuple[int, int], list[int]] = defaultdict(list)
+        for panel_id, (x, y) in self.positions.items():
+            self._grid[self._cell(x, y)].append(panel_id)
+
+        self.adjacency: dict[int, frozenset[int]] = {}
+        for panel_id, (x, y) in self.positions.items():
+            self.adjacency[panel_id] = frozenset(
+                other
+                for other in self._nearby(x, y, 1)
+                if other != panel_id
+                and math.dist((x, y), self.positions[other])
+                <= (self._radius[panel_id] + self._radius[other])
+                * (1 + ADJACENCY_TOLERANCE)
+            )
+
+    def _cell(self, x: float, y: float) -> tuple[int, int]:
+        """Return the grid cell of a point."""
+        return (math.floor(x / self._cell_size), math.floor(y / self._cell_size))
+
+    def _nearby(self, x: float, y: float, ring: int) -> Iterator[int]:
+        """Yield the panels within ring cells of a point."""
+        cell_x, cell_y = self._cell(x, y)
+        for grid_x in range(cell_x - ring, cell_x + ring + 1):
+            for grid_y in range(cell_y - ring, cell_y + ring + 1):
+                yield from self._grid.get((grid_x, grid_y), ())
+
+    def neighbors(self, panel_id: int) -> frozenset[int]:
+        """Return the panels that share an edge with a panel."""
+        return self.adjacency.get(panel_id, frozenset())
+
+    def nearest(self, x: float, y: float) -> int | None:
+        """Return the panel whose centre is closest to a point."""
+        if not self.positions:
+            return None
+        best: int | None = None
+        best_distance = math.inf
+        ring = 0
+        # Widen the search one ring of cells at a time until no closer panel
+        # can exist outside the rings already searched.
+        while best is None or best_distance > (ring - 1) * self._cell_size:
+            cell_x, cell_y = self._cell(x, y)
+            for grid_x in range(cell_x - ring, cell_x + ring + 1):
+                for grid_y in range(cell_y - ring, cell_y + ring + 1):
+                    if max(abs(grid_x - cell_x), abs(grid_y - cell_y)) != ring:
+                        continue
+                    for panel_id in self._grid.get((grid_x, grid_y), ()):
+                        distance = math.dist((x, y), self.positions[panel_id])
+                        if distance < best_distance:
+                            best, best_distance = panel_id, distance
+            ring += 1
+        return best
+
+    def within(self, x: float, y: float, radius: float) -> list[int]:
+        """Return the panels whose centre lies within radius of a point."""
+        ring = math.ceil(radius / self._cell_size)
+        return [
+            panel_id
+            for panel_id in self._nearby(x, y, ring)
+            if math.dist((x, y), self.positions[panel_id]) <= radius
+        ]
@@ -1,36 +1,28 @@
 """Platform for light integration."""
 import logging
-import threading
-import time
 from typing import Any
 
 from homeassistant.components.light import (
     ATTR_BRIGHTNESS,
+    ATTR_EFFECT,
     ATTR_RGB_COLOR,
     ATTR_TRANSITION,
     ColorMode,
     LightEntity,
+    LightEntityFeature,
 )
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
 from homeassistant.helpers.device_registry import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
-from .const import DOMAIN
+from .const import DOMAIN, LIGHT_SHAPE_TYPES
 from .nanoleaf_controller import NanoleafController
 
 _LOGGER = logging.getLogger(__name__)
 
 
-def nanoleaf_panels_thread(hass: HomeAssistant, entry: ConfigEntry) -> None:
-    """Thread to listen panel events."""
-    while True:
-        nanoleaf_controller = hass.data[DOMAIN][entry.entry_id]
-        nanoleaf_controller.process_events_stream(entry.entry_id)
-        time.sleep(5)
-        _LOGGER.info("Reconnect")
-
-
 # 'positionData': [
 # {'panelId': 30526, 'x': 25, 'y': 0, 'o': 0, 'shapeType': 9},
 # {'panelId': 5584, 'x': 59, 'y': 19, 'o': 60, 'shapeType': 9},
@@ -53,17 +45,24 @@ async def async_setup_entry(
 ) -> None:
     """Lights setup entry."""
     nanoleaf_controller: NanoleafController = hass.data[DOMAIN][entry.entry_id]
+    info = nanoleaf_controller.info
+    panel_lights: dict[int, PanelLight] = {}
 
-    entities = None
-    info = await nanoleaf_controller.get_info()
-    if info is not None:
+    @callback
+    def async_add_panels() -> None:
+        """Add a light for every new panel of the layout, remove missing ones."""
         entities = []
-        panels = info["panelLayout"]["layout"]["positionData"]
-        panels.sort(key=lambda panel: panel["panelId"])
+        panels = sorted(
+            (
+                panel
+                for panel in info["panelLayout"]["layout"]["positionData"]
+                if panel["shapeType"] in LIGHT_SHAPE_TYPES
+            ),
+            key=lambda panel: panel["panelId"],
+        )
 
-        index = 1
-        for panel in panels:
-            if panel["shapeType"] == 9:
+        for index, panel in enumerate(panels, 1):
+            if panel["panelId"] not in panel_lights:
                 entity = PanelLight(
                     panel["panelId"],
                     f"Panel{index:02}",
@@ -71,20 +70,34 @@ async def async_setup_entry(
                     info,
                 )
                 entities.append(entity)
-                index += 1
+                panel_lights[panel["panelId"]] = entity
 
-    if entities is not None:
-        async_add_entities(entities)
+        # Panels taken off the wall, also while Home Assistant was stopped,
+        # lose their light and registry entry. A layout without any panel is
+        # more likely a glitch than an empty wall.
+        if panels:
+            panel_ids = {panel["panelId"] for panel in panels}
+            for panel_id in panel_lights.keys() - panel_ids:
+                del panel_lights[panel_id]
+            entity_reg = er.async_get(hass)
+            for entity_entry in er.async_entries_for_config_entry(
+                entity_reg, entry.entry_id
+            ):
+                if (
+                    entity_entry.domain == "light"
+                    and str(entity_entry.unique_id).isdigit()
+                    and int(entity_entry.unique_id) not in panel_ids
+                ):
+                    entity_reg.async_remove(entity_entry.entity_id)
 
-        thread = threading.Thread(
-            target=nanoleaf_panels_thread,
-            name="nanoleaf_panels_thread",
-            args=(
-                hass,
-                entry,
-            ),
-        )
-        thread.start()
+        if entities:
+            async_add_entities(entities)
+
+    # Entities come from the stored snapshot; panels found by the background
+    # refresh or a layout change are added when the controller reports them.
+    async_add_entities([DeviceLight(nanoleaf_controller, info)])
+    async_add_panels()
+    entry.async_on_unload(nanoleaf_controller.async_add_listener(async_add_panels))
 
 
 class PanelLight(LightEntity):
@@ -96,7 +109,8 @@ class PanelLight(LightEntity):
     _attr_is_on = True
     _attr_brightness = 255
     _attr_rgb_color = (255, 255, 255)
-    _transition = 1
+    # Transition of the next turn on, in tenths of a second.
+    _transition = 10
 
     def __init__(self, unique_id, name, nanoleaf_controller, device) -> None:
         """Initialize an PanelLight."""
@@ -106,46 +120,70 @@ class PanelLight(LightEntity):
         self._attr_unique_id = unique_id
         self._attr_name = name
 
-        self._attr_brightness = int(
-            255
-            * device["state"]["brightness"]["value"]
-            / device["state"]["brightness"]["max"]
+        self._update_from_device()
+
+    async def async_added_to_hass(self) -> None:
+        """Subscribe to device state pushed by the controller."""
+        self.async_on_remove(
+            self.nanoleaf_controller.async_add_listener(self._handle_device_update)
+        )
+
+    @callback
+    def _handle_device_update(self) -> None:
+        """Handle device state pushed by the controller."""
+        self._update_from_device()
+        self.async_write_ha_state()
+
+    def _update_from_device(self) -> None:
+        """Take brightness, colour and on/off from the controller."""
+        framebuffer = self.nanoleaf_controller.framebuffer
+        if (
+            framebuffer is not None
+            and self._attr_unique_id in framebuffer
+            and not self.nanoleaf_controller.written_behind(self._attr_unique_id)
+        ):
+            self._attr_rgb_color = framebuffer.get(self._attr_unique_id)
+            self._attr_brightness = framebuffer.get_brightness(self._attr_unique_id)
+        self._attr_is_on = (
+            self.device["state"]["on"]["value"]
+            and bool(self._attr_brightness)
+            and any(self._attr_rgb_color)
         )
-        self._attr_is_on = device["state"]["on"]["value"]
 
     async def async_turn_on(self, **kwargs: Any) -> None:
-        """Instruct the light to turn on."""
-        default_rgb = None
-        if not kwargs:
-            default_rgb = (255, 255, 255)
+        """Instruct the light to turn on.
 
+        Brightness is per panel: it is scaled into the colour and sent in the
+        same frame, while the device brightness belongs to the device light.
+        """
         new_transition = kwargs.get(ATTR_TRANSITION)
         if new_transition is not None:
-            self._transition = new_transition
+            # Panels take transitions in whole tenths of a second.
+            self._transition = round(new_transition * 10)
 
-        new_brightness = kwargs.get(ATTR_BRIGHTNESS)
-        if new_brightness is not None:
+        if (new_rgb_color := kwargs.get(ATTR_RGB_COLOR)) is not None:
+            self._attr_rgb_color = new_rgb_color
+        elif not any(self._attr_rgb_color):
+            self._attr_rgb_color = (255, 255, 255)
+
+        if (new_brightness := kwargs.get(ATTR_BRIGHTNESS)) is not None:
             self._attr_brightness = new_brightness
-            self._attr_brightness = await self.nanoleaf_controller.set_brightness(
-                self._attr_brightness * 100 / 255, self._transition
-            )
-            self._attr_is_on = bool(self._attr_brightness)
+        elif not self._attr_brightness:
+            self._attr_brightness = 255
 
-        new_rgb_color = kwargs.get(ATTR_RGB_COLOR, default_rgb)
-        if new_rgb_color is not None:
-            self._attr_rgb_color = new_rgb_color
-            self._attr_is_on = await self.nanoleaf_controller.display_static_effect(
-                self._attr_unique_id,
-                self._attr_rgb_color,
-                self._transition * 10,
-            )
+        self._attr_is_on = await self.nanoleaf_controller.display_static_effect(
+            self._attr_unique_id,
+            self._attr_rgb_color,
+            self._transition,
+            self._attr_brightness,
+        )
 
     async def async_turn_off(self, **kwargs: Any) -> None:
-        """Instruct the light to turn off."""
-        self._attr_rgb_color = (0, 0, 0)
+        """Instruct the light to turn off, keeping its colour for turn on."""
+        self._attr_brightness = 0
         self._attr_is_on = False
         await self.nanoleaf_controller.display_static_effect(
-            self._attr_unique_id, self._attr_rgb_color, 1 * 10
+            self._attr_unique_id, self._attr_rgb_color, 1 * 10, 0
         )
 
     # def update(self) -> None:
@@ -171,3 +209,78 @@ class PanelLight(LightEntity):
             hw_version=self.device["hardwareVersion"],
             configuration_url=f"http://{self.nanoleaf_controller.netloc.split(':')[0]}",
         )
+
+
+class DeviceLight(LightEntity):
+    """The whole device, switched, dimmed and set to its native effects."""
+
+    _attr_supported_color_modes = {ColorMode.BRIGHTNESS}
+    _attr_color_mode = ColorMode.BRIGHTNESS
+    _attr_supported_features = LightEntityFeature.TRANSITION | LightEntityFeature.EFFECT
+
+    def __init__(self, nanoleaf_controller, device) -> None:
+        """Initialize a DeviceLight."""
+        self.nanoleaf_controller = nanoleaf_controller
+        self.device = device
+
+        self._attr_unique_id = device["name"]
+        self._attr_name = device["name"]
+
+        self._update_from_device()
+
+    async def async_added_to_hass(self) -> None:
+        """Subscribe to device state pushed by the controller."""
+        self.async_on_remove(
+            self.nanoleaf_controller.async_add_listener(self._handle_device_update)
+        )
+
+    @callback
+    def _handle_device_update(self) -> None:
+        """Handle device state pushed by the controller."""
+        self._update_from_device()
+        self.async_write_ha_state()
+
+    @property
+    def available(self) -> bool:
+        """Return whether the device answers.
+
+        Panel lights stay available, so that their commands reach the
+        write-behind queue during an outage.
+        """
+        return self.nanoleaf_controller.available
+
+    def _update_from_device(self) -> None:
+        """Take the device brightness, on/off and effect from the controller."""
+        brightness = self.device["state"]["brightness"]
+        self._attr_brightness = round(255 * brightness["value"] / brightness["max"])
+        self._attr_is_on = self.device["state"]["on"]["value"]
+        self._attr_effect_list = self.nanoleaf_controller.effect_list
+        self._attr_effect = self.nanoleaf_controller.effect
+
+    async def async_turn_on(self, **kwargs: Any) -> None:
+        """Instruct the device to turn on."""
+        if (effect := kwargs.get(ATTR_EFFECT)) is not None:
+            # Selecting an effect also switches the device on.
+            if await self.nanoleaf_controller.async_select_effect(effect):
+                self._attr_effect = effect
+                self._attr_is_on = True
+        if (brightness := kwargs.get(ATTR_BRIGHTNESS)) is not None:
+            # Setting the brightness also switches the device on.
+            result = await self.nanoleaf_controller.set_brightness(
+                brightness * 100 / 255, kwargs.get(ATTR_TRANSITION, 0)
+            )
+            if result is not None:
+                self._attr_brightness = brightness
+                self._attr_is_on = True
+        elif effect is None and await self.nanoleaf_controller.set_power(True):
+            self._attr_is_on = True
+
+    async def async_turn_off(self, **kwargs: Any) -> None:
+        """Instruct the device to turn off."""
+        if await self.nanoleaf_controller.set_power(False):
+            self._attr_is_on = False
+
+    @property
+    def device_info(self) -> DeviceInfo | None:
+        """Build device info."""
+        return DeviceInfo(identifiers={(DOMAIN, self.device["name"])})
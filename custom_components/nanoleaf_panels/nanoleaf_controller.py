@@ -1,39 +1,319 @@
 """The Nanoleaf controllerintegration."""
+import asyncio
+from collections import OrderedDict
+from collections.abc import Collection
+from functools import partial
+import hashlib
 from http import HTTPStatus
 import json
 import logging
+import time
 from typing import Any
 
-import requests
+import aiohttp
 
-from homeassistant.core import HomeAssistant
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
 from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.storage import Store
 
-from .const import EVENT
+from .const import (
+    CACHED_EFFECT_PREFIX,
+    CACHED_EFFECTS_KEY,
+    CONNECT_TIMEOUT,
+    DEFAULT_BATCH_WINDOW,
+    DEFAULT_STREAM_FPS,
+    DEFAULT_STREAM_IDLE_TIMEOUT,
+    EVENT,
+    EXT_CONTROL_PORT,
+    LIGHT_SHAPE_TYPES,
+    MAX_CACHED_EFFECTS,
+    MAX_CONCURRENT_REQUESTS,
+    MAX_RECONNECT_DELAY,
+    MAX_TRANSITION,
+    MAX_WRITE_BEHIND,
+    RECONNECT_DELAY,
+    REQUEST_TIMEOUT,
+    SNAPSHOT_KEYS,
+    SNAPSHOT_SAVE_DELAY,
+    TOUCH_EVENTS_PORT_HEADER,
+)
+from .command_scheduler import CommandScheduler
+from .framebuffer import Framebuffer
+from .layout import PanelLayout
+from .stats import ControllerStats
+from .touch import TOUCH_DOWN, TOUCH_SWIPE, GestureRecognizer, TouchDataProtocol
+from .trace import (
+    TRACE_COMMAND,
+    TRACE_SSE,
+    TRACE_TOKEN,
+    TRACE_TOUCH,
+    TraceRecorder,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
+# Event stream channels, sent as the id of each server-sent event.
+EVENTS_STATE = "1"
+EVENTS_LAYOUT = "2"
+EVENTS_EFFECTS = "3"
+EVENTS_TOUCH = "4"
+
+# State event attributes and the info["state"] keys they update.
+STATE_ATTRS = {1: "on", 2: "brightness", 3: "hue", 4: "sat", 5: "ct", 6: "colorMode"}
+# Selected effect names such as *Static* that are not stored effects.
+SPECIAL_EFFECT_PREFIX = "*"
+STATIC_EFFECT = "*Static*"
+EXT_CONTROL_EFFECT = "*ExtControl*"
+
+# Command scheduler targets.
+TARGET_BRIGHTNESS = "brightness"
+TARGET_EFFECT = "effect"
+TARGET_EFFECT_CATALOGUE = "effect_catalogue"
+TARGET_FRAME = "frame"
+TARGET_POWER = "power"
+
+# Gesture codes reported on the touch event channel.
+GESTURES = {0: "single_tap", 1: "double_tap"}
+
+
+def _transition(transition: float) -> int:
+    """Return a panel transition in tenths of a second as a frame can hold it."""
+    return min(max(int(transition), 0), MAX_TRANSITION)
+
 
 class NanoleafController:
     """Set up Nanoleaf Dev from a config entry."""
 
     def __init__(
-        self, hass: HomeAssistant, netloc: str | None = None, token: str | None = None
+        self,
+        hass: HomeAssistant,
+        netloc: str | None = None,
+        token: str | None = None,
+        batch_window: float = DEFAULT_BATCH_WINDOW,
+        store: Store | None = None,
+        stream_idle_timeout: float = DEFAULT_STREAM_IDLE_TIMEOUT,
     ) -> None:
         """Initialize internal props."""
         self.hass = hass
         self.netloc = netloc
         self.token = token
         self.info = None
+        self._store = store
+        self.batch_window = batch_window
+        # Panel colours requested within batch_window are written as one frame.
+        self._pending_frame: dict[int, tuple[int, int, int, int]] = {}
+        self._cache_pending_frame = False
+        # Panel brightness, 0-255, to fold into the colours of the next frame.
+        self._pending_brightness: dict[int, int] = {}
+        # Panel colours and brightness requested while the device is
+        # unavailable, latest per panel, written as one frame once it is back.
+        self._write_behind: dict[int, tuple[int, int, int, int]] = {}
+        self._write_behind_brightness: dict[int, int] = {}
+        self.available = True
+        self._track_availability = False
+        self._probe: asyncio.Task | None = None
+        self._scheduler = CommandScheduler(hass)
+        self.framebuffer: Framebuffer | None = None
+        self._panel_layout: PanelLayout | None = None
+        # Hashes of effects installed on the device, least recently used first.
+        self._effect_cache: OrderedDict[str, None] = OrderedDict()
+        # Held while the cache and the effects on the device are brought in line.
+        self._effect_cache_lock = asyncio.Lock()
+        # Native effects of the device by name, with their animation data.
+        self.effects: dict[str, dict[str, Any]] = {}
+        # extControl streaming: panels waiting to be sent and their transitions.
+        self.stream_fps = DEFAULT_STREAM_FPS
+        self._stream_transport: asyncio.DatagramTransport | None = None
+        self._stream_dirty: dict[int, int] = {}
+        self._stream_handle: asyncio.TimerHandle | None = None
+        self._stream_last_sent = 0.0
+        # panelId (as a string) -> (device_id, entity_id) of its light entity.
+        self._panel_entities: dict[str, tuple[str | None, str]] = {}
+        # Touch gestures received since the last flush and when the first came.
+        self._pending_touches: list[dict[str, Any]] = []
+        self._touches_received = 0.0
+        # Raw touch data stream: the UDP port the device sends touches to.
+        self.touch_port: int | None = None
+        self._touch_transport: asyncio.DatagramTransport | None = None
+        self._gestures = GestureRecognizer(
+            hass, self._async_fire_raw_gesture, self._panel_neighbors
+        )
+        self._entry_id: str | None = None
+        # Refresh of the device information started by a layout event.
+        self._refresh_task: asyncio.Task | None = None
+        self._listeners: list[CALLBACK_TYPE] = []
+        self.stream_idle_timeout = stream_idle_timeout
+        # Commands stay on the event loop and share HA's keep-alive session;
+        # the semaphore bounds how many requests hit the device at once.
+        self._semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        self.stats = ControllerStats()
+        self._recorder: TraceRecorder | None = None
+        self._timeout = aiohttp.ClientTimeout(
+            total=REQUEST_TIMEOUT, sock_connect=CONNECT_TIMEOUT
+        )
+
+    async def _request(
+        self, method: str, path: str, payload: str | None = None
+    ) -> tuple[int, Any] | None:
+        """Send a request to the device and return its status and JSON body.
+
+        While the device is unavailable only reads go out, so the refresh can
+        tell when it is back; commands fail at once.
+        """
+        endpoint = path.partition("/")[2] or ("new" if path == "new" else "info")
+        if self._recorder is not None:
+            self._recorder.record(
+                TRACE_COMMAND,
+                [method, path.replace(self.token or TRACE_TOKEN, TRACE_TOKEN), payload],
+            )
+        session = async_get_clientsession(self.hass)
+        self.stats.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.stats.waiting -= 1
+        if not self.available and method != "GET":
+            self.stats.rejected += 1
+            self._semaphore.release()
+            return None
+        self.stats.in_flight += 1
+        start = time.monotonic()
+        try:
+            async with session.request(
+                method,
+                f"http://{self.netloc}/api/v1/{path}",
+                data=payload,
+                timeout=self._timeout,
+            ) as response:
+                body = None
+                if response.status == HTTPStatus.OK:
+                    body = await response.json(content_type=None)
+                self.stats.latency[endpoint].record(time.monotonic() - start)
+                if response.status >= HTTPStatus.BAD_REQUEST:
+                    self.stats.failures[endpoint] += 1
+                self.async_set_available(True)
+                return response.status, body
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as err:
+            self.stats.failures[endpoint] += 1
+            _LOGGER.debug("%s %s failed: %s", method, self.netloc, err)
+            self.async_set_available(False)
+            return None
+        except (aiohttp.ClientError, ValueError) as err:
+            self.stats.failures[endpoint] += 1
+            _LOGGER.debug("%s %s failed: %s", method, self.netloc, err)
+            return None
+        finally:
+            self.stats.in_flight -= 1
+            self._semaphore.release()
+
+    @property
+    def recording(self) -> bool:
+        """Return whether traffic is being recorded to a trace file."""
+        return self._recorder is not None
+
+    @property
+    def trace_path(self) -> str | None:
+        """Return the trace file being recorded to."""
+        return self._recorder.path if self._recorder is not None else None
+
+    async def async_start_recording(self, path: str) -> None:
+        """Record the event stream, touches and commands to a trace file.
+
+        The token is left out of recorded paths and the serial number out of
+        the device info, so traces can be shared.
+        """
+        await self.async_stop_recording()
+        recorder = TraceRecorder(self.hass, path)
+        info = None
+        if self.info is not None:
+            info = {key: value for key, value in self.info.items() if key != "serialNo"}
+        await recorder.async_start(info)
+        self._recorder = recorder
+
+    async def async_stop_recording(self) -> str | None:
+        """Stop recording and return the path of the trace file."""
+        if (recorder := self._recorder) is None:
+            return None
+        self._recorder = None
+        await recorder.async_stop()
+        return recorder.path
+
+    @property
+    def commands_in_flight(self) -> int:
+        """Return the number of scheduled commands being sent."""
+        return self._scheduler.in_flight
+
+    @property
+    def commands_queued(self) -> int:
+        """Return the number of scheduled commands waiting to be sent."""
+        return self._scheduler.queued
+
+    @property
+    def write_behind(self) -> int:
+        """Return the number of panels waiting for the device to be back."""
+        return len(self._write_behind)
+
+    def written_behind(self, panel_id: int) -> bool:
+        """Return True if the latest colour of a panel waits in the queue."""
+        return panel_id in self._write_behind
+
+    @callback
+    def async_track_availability(self) -> CALLBACK_TYPE:
+        """Follow whether the device answers, until the returned callback."""
+        self._track_availability = True
+
+        @callback
+        def stop_tracking() -> None:
+            self._track_availability = False
+            if self._probe is not None:
+                self._probe.cancel()
+
+        return stop_tracking
+
+    @callback
+    def async_set_available(self, available: bool) -> None:
+        """Mark the device reachable or not and tell the listeners.
+
+        Once unavailable the device information is refreshed with growing
+        delays until it answers; then the write-behind queue is written and
+        an effect catalogue missing effects is fetched again.
+        """
+        if not self._track_availability or available == self.available:
+            return
+        self.available = available
+        if available:
+            _LOGGER.info("%s is available again", self.netloc)
+            if self._probe is not None and self._probe is not asyncio.current_task():
+                self._probe.cancel()
+            self.hass.async_create_background_task(
+                self._async_write_pending_behind(), f"write behind {self.netloc}"
+            )
+            self._async_check_effects()
+        else:
+            _LOGGER.info("%s is unavailable", self.netloc)
+            if self._probe is None:
+                self._probe = self.hass.async_create_background_task(
+                    self._async_probe(), f"probe {self.netloc}"
+                )
+        self._async_notify_listeners()
+
+    async def _async_probe(self) -> None:
+        """Refresh the device information until the device answers again."""
+        delay = RECONNECT_DELAY
+        try:
+            while not self.available:
+                await asyncio.sleep(delay)
+                await self.async_refresh()
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+        finally:
+            self._probe = None
 
     async def new_token(self) -> str | None:
         """Generate new token for device access."""
-        response = await self.hass.async_add_executor_job(
-            requests.post,
-            f"http://{self.netloc}/api/v1/new",
-        )
-        if response.status_code == HTTPStatus.OK:
-            payload = response.json()
+        result = await self._request("POST", "new")
+        if result is not None and result[0] == HTTPStatus.OK:
+            payload = result[1]
             if payload and payload["auth_token"]:
                 self.token = payload["auth_token"]
                 return self.token
@@ -43,12 +323,9 @@ class NanoleafController:
         """Check if auth token is valid."""
         # 192.168.1.36:16021 LRMudXYA0hLEZeLAWMGADgnJq14Qx9SY
         token = new_token or self.token
-        response = await self.hass.async_add_executor_job(
-            requests.get,
-            f"http://{self.netloc}/api/v1/{new_token}",
-        )
+        result = await self._request("GET", token)
 
-        if response.status_code == HTTPStatus.OK:
+        if result is not None and result[0] == HTTPStatus.OK:
             self.token = token
         else:
             return False
@@ -69,21 +346,159 @@ class NanoleafController:
     # 'qkihnokomhartlnp': {},
     # 'schedules': {},
     # 'state': {'brightness': {'value': 9, 'max': 100, 'min': 0}, 'colorMode': 'effect', 'ct': {'value': 6493, 'max': 6500, 'min': 1200}, 'hue': {'value': 0, 'max': 360, 'min': 0}, 'on': {'value': True}, 'sat': {'value': 0, 'max': 100, 'min': 0}}}
-    async def get_info(self) -> dict[str, Any] | None:
+    async def get_info(self, refresh: bool = False) -> dict[str, Any] | None:
         """Fetch device information."""
+        if self.info is None or refresh:
+            result = await self._request("GET", self.token)
+
+            if result is not None and result[0] == HTTPStatus.OK:
+                if self.info is None:
+                    self.info = result[1]
+                else:
+                    # Entities hold a reference to info, so refresh it in place.
+                    self.info.clear()
+                    self.info.update(result[1])
+                self._async_layout_updated()
+                self._async_save_snapshot()
+                self._async_effect_selected()
+                self._async_check_effects()
+
+        return self.info
+
+    async def async_refresh(self) -> None:
+        """Fetch live device information and update listeners."""
+        if await self.get_info(refresh=True) is not None:
+            self._async_notify_listeners()
+
+    async def async_load_snapshot(self) -> bool:
+        """Load the last stored device information."""
+        if self._store is None or (snapshot := await self._store.async_load()) is None:
+            return False
+        self._effect_cache = OrderedDict.fromkeys(snapshot.pop(CACHED_EFFECTS_KEY, []))
+        self.info = snapshot
+        self._async_layout_updated()
+        return True
+
+    @callback
+    def _async_save_snapshot(self) -> None:
+        """Schedule storing the cached device information."""
+        if self._store is not None and self.info is not None:
+            self._store.async_delay_save(self._snapshot, SNAPSHOT_SAVE_DELAY)
+
+    @callback
+    def _snapshot(self) -> dict[str, Any]:
+        """Return the part of the device information kept across restarts."""
+        snapshot = {key: self.info[key] for key in SNAPSHOT_KEYS if key in self.info}
+        snapshot[CACHED_EFFECTS_KEY] = list(self._effect_cache)
+        return snapshot
+
+    @property
+    def panel_layout(self) -> PanelLayout | None:
+        """Return the adjacency graph and spatial index of the panels.
+
+        The index is built on first use and kept until the layout changes.
+        """
         if self.info is None:
-            response = await self.hass.async_add_executor_job(
-                requests.get,
-                f"http://{self.netloc}/api/v1/{self.token}",
+            return None
+        layout = self.info["panelLayout"]["layout"]
+        if self._panel_layout is None or self._panel_layout.layout is not layout:
+            self._panel_layout = PanelLayout(layout)
+        return self._panel_layout
+
+    @callback
+    def _async_layout_updated(self) -> None:
+        """Rebuild the framebuffer and panel index for the current layout."""
+        if (
+            self._panel_layout is not None
+            and self._panel_layout.layout == self.info["panelLayout"]["layout"]
+        ):
+            # Same layout as before: keep the index for the new info dict.
+            self._panel_layout.layout = self.info["panelLayout"]["layout"]
+        else:
+            self._panel_layout = None
+        old_framebuffer = self.framebuffer
+        self.framebuffer = Framebuffer(
+            panel["panelId"]
+            for panel in self.info["panelLayout"]["layout"]["positionData"]
+            if panel["shapeType"] in LIGHT_SHAPE_TYPES
+        )
+        if old_framebuffer is not None:
+            kept = [
+                panel_id
+                for panel_id in old_framebuffer.panel_ids
+                if panel_id in self.framebuffer
+            ]
+            self.framebuffer.update(
+                {panel_id: (*old_framebuffer.get(panel_id), 0) for panel_id in kept},
+                {
+                    panel_id: old_framebuffer.get_brightness(panel_id)
+                    for panel_id in kept
+                },
+            )
+            # New panels show whatever they came up with.
+            self.framebuffer.valid = old_framebuffer.valid and len(kept) == len(
+                self.framebuffer
             )
 
-            if response.status_code == HTTPStatus.OK:
-                self.info = response.json()
+    @callback
+    def _async_effect_selected(self) -> None:
+        """Distrust the framebuffer once an effect other than ours is selected.
 
-        return self.info
+        The extControl stream is closed once the device left extControl, so
+        colours go back to static frames instead of an ignored socket.
+        """
+        if self.info is None:
+            return
+        selected = self.info["effects"].get("select", "")
+        if self.streaming:
+            if selected == EXT_CONTROL_EFFECT:
+                return
+            _LOGGER.debug("%s left extControl for %s", self.netloc, selected)
+            self.async_stop_streaming()
+        if selected != STATIC_EFFECT and not selected.startswith(
+            CACHED_EFFECT_PREFIX
+        ):
+            self._async_invalidate_framebuffer()
+
+    @callback
+    def _async_invalidate_framebuffer(self) -> None:
+        """Send every panel with the next frame, whatever the framebuffer says."""
+        if self.framebuffer is not None:
+            self.framebuffer.valid = False
+
+    @callback
+    def async_add_listener(self, update_callback: CALLBACK_TYPE) -> CALLBACK_TYPE:
+        """Listen for device state pushed over the event stream."""
+        self._listeners.append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            self._listeners.remove(update_callback)
+
+        return remove_listener
 
-    async def set_brightness(self, brightness, transition) -> int | None:
-        """Set brightness for all panels."""
+    @callback
+    def _async_notify_listeners(self) -> None:
+        """Tell listeners that the cached device info changed."""
+        for update_callback in list(self._listeners):
+            update_callback()
+
+    async def set_brightness(
+        self, brightness, transition, delay: float = 0
+    ) -> int | None:
+        """Set brightness for all panels.
+
+        While a brightness request is in flight only the latest value is kept
+        and sent once the device has answered.
+        """
+        return await self._scheduler.async_submit(
+            TARGET_BRIGHTNESS,
+            partial(self._write_brightness, brightness, transition),
+            delay,
+        )
+
+    async def _write_brightness(self, brightness, transition) -> int | None:
+        """Write the device brightness."""
         payload = json.dumps(
             {
                 "brightness": {
@@ -92,91 +507,661 @@ class NanoleafController:
                 }
             }
         )
-        response = await self.hass.async_add_executor_job(
-            requests.put,
-            f"http://{self.netloc}/api/v1/{self.token}/state/brightness",
-            payload,
+        response = await self._request(
+            "PUT", f"{self.token}/state/brightness", payload
         )
         result = None
-        if int(response.status_code / 100) == 2:
+        if response is not None and int(response[0] / 100) == 2:
             result = brightness
         return result
 
-    async def display_static_effect(self, panel_id, rgb, transition) -> bool:
-        """Set static effect for a single panel."""
+    async def set_power(self, on: bool) -> bool:
+        """Switch the whole device on or off."""
+        return await self._scheduler.async_submit(
+            TARGET_POWER, partial(self._write_power, on)
+        )
+
+    async def _write_power(self, on: bool) -> bool:
+        """Write the device on/off state."""
+        response = await self._request(
+            "PUT", f"{self.token}/state", json.dumps({"on": {"value": on}})
+        )
+        return response is not None and int(response[0] / 100) == 2
+
+    async def display_static_effect(
+        self, panel_id, rgb, transition, brightness: int | None = None
+    ) -> bool:
+        """Set static effect for a single panel.
+
+        The colour is queued and written together with every other panel
+        colour requested within the batch window. While a frame is in flight
+        new colours keep accumulating, latest per panel, for the next one.
+        A brightness, from 0 to 255, dims this panel only and is scaled into
+        its colour on the host, so it costs no extra request.
+        """
         (red, green, blue) = rgb
+        self._pending_frame[panel_id] = (red, green, blue, _transition(transition))
+        if brightness is not None:
+            self._pending_brightness[panel_id] = brightness
+        return await self._scheduler.async_submit(
+            TARGET_FRAME, self._async_flush_frame, self.batch_window
+        )
+
+    async def async_set_panels(
+        self,
+        frame: dict[int, tuple[int, int, int, int]],
+        cache: bool = False,
+        delay: float = 0,
+    ) -> bool:
+        """Write a map of panel colours and transitions in a single frame.
+
+        Listeners are notified once after the write, so every entity updates
+        in the same pass. With cache the frame is stored as a named effect on
+        the device, so repeating the same scene only costs a select. The write
+        is held back by delay seconds when no other frame is in flight.
+        Every panel of the map is shown at its full level, so panels turned
+        off as lights come back on.
+        """
+        self._pending_frame.update(
+            (panel_id, (red, green, blue, _transition(transition)))
+            for panel_id, (red, green, blue, transition) in frame.items()
+        )
+        self._pending_brightness.update(dict.fromkeys(frame, 255))
+        self._cache_pending_frame |= cache
+        result = await self._scheduler.async_submit(
+            TARGET_FRAME, self._async_flush_frame, delay
+        )
+        self._async_notify_listeners()
+        return result
+
+    async def _async_flush_frame(self) -> bool:
+        """Write all panel colours gathered so far.
+
+        While the device is unavailable, or when it drops during the write,
+        they go to the write-behind queue instead.
+        """
+        frame = self._pending_frame
+        cache = self._cache_pending_frame
+        brightness = self._pending_brightness
+        self._pending_frame = {}
+        self._cache_pending_frame = False
+        self._pending_brightness = {}
+        if self.available:
+            result = await self._write_frame_changes(frame, cache, brightness)
+            if result or self.available:
+                return result
+        self._async_write_behind(frame, brightness)
+        return True
+
+    @callback
+    def _async_write_behind(
+        self,
+        frame: dict[int, tuple[int, int, int, int]],
+        brightness: dict[int, int],
+    ) -> None:
+        """Keep the latest colour of each panel, oldest dropped past the bound."""
+        for panel_id, colour in frame.items():
+            self._write_behind.pop(panel_id, None)
+            self._write_behind[panel_id] = colour
+        self._write_behind_brightness.update(brightness)
+        while len(self._write_behind) > MAX_WRITE_BEHIND:
+            panel_id = next(iter(self._write_behind))
+            del self._write_behind[panel_id]
+            self._write_behind_brightness.pop(panel_id, None)
+
+    async def _async_write_pending_behind(self) -> None:
+        """Write the panels changed during an outage as one frame."""
+        if not self._write_behind:
+            return
+        # Colours requested since the device came back are newer.
+        self._pending_frame = {**self._write_behind, **self._pending_frame}
+        self._pending_brightness = {
+            **self._write_behind_brightness,
+            **self._pending_brightness,
+        }
+        self._write_behind = {}
+        self._write_behind_brightness = {}
+        await self._scheduler.async_submit(TARGET_FRAME, self._async_flush_frame)
+        self._async_notify_listeners()
+
+    async def _write_frame_changes(
+        self,
+        frame: dict[int, tuple[int, int, int, int]],
+        cache: bool = False,
+        brightness: dict[int, int] | None = None,
+    ) -> bool:
+        """Write the panels whose colour changed, keeping the others as shown."""
+        if self.framebuffer is None:
+            return await self._write_static_frame(frame.items(), cache)
+
+        changes = self.framebuffer.changes(frame, brightness)
+        if not changes:
+            return True
+
+        if self.streaming:
+            self.framebuffer.update({}, brightness)
+            if not self.framebuffer.valid:
+                # Nothing is known about the panels: stream all of them once.
+                changes = {
+                    panel_id: (*self.framebuffer.get(panel_id), 0)
+                    for panel_id in self.framebuffer.panel_ids
+                } | changes
+                self.framebuffer.valid = True
+            self.stream_frame(changes)
+            return True
+
+        # A static effect turns off every panel it does not mention, so the
+        # untouched panels are sent with the colour they already show.
+        result = await self._write_static_frame(
+            list(self.framebuffer.merged(changes, brightness)), cache
+        )
+        if result:
+            self.framebuffer.update(changes, brightness)
+            self.framebuffer.valid = True
+        return result
+
+    async def _write_static_frame(
+        self,
+        frame: Collection[tuple[int, tuple[int, int, int, int]]],
+        cache: bool = False,
+    ) -> bool:
+        """Display a static effect covering every panel of the frame."""
         white = 0
-        payload = json.dumps(
+        anim_data = " ".join(
+            [str(len(frame))]
+            + [
+                f"{panel_id} 1 {red} {green} {blue} {white} {transition}"
+                for panel_id, (red, green, blue, transition) in frame
+            ]
+        )
+        effect = {
+            "animType": "static",
+            "animData": anim_data,
+            "loop": False,
+            "palette": [
+                # {"hue": 0, "saturation": 100, "brightness": brightness},
+                # {"hue": 30, "saturation": 100, "brightness": 200},
+            ],
+            "brightnessRange": {"minValue": 0, "maxValue": 255},
+            "colorType": "HSB",
+        }
+        if cache:
+            return await self.async_display_cached(effect)
+        return await self._write_effects({"write": {"command": "display", **effect}})
+
+    async def async_display_custom(self, anim_data: str, loop: bool = True) -> bool:
+        """Upload a multi-frame custom effect and let the device play it.
+
+        The effect goes through the on-device cache, so showing the same
+        animation again only costs a select.
+        """
+        self.async_stop_streaming()
+        self._async_invalidate_framebuffer()
+        return await self.async_display_cached(
+            {
+                "animType": "custom",
+                "animData": anim_data,
+                "loop": loop,
+                "palette": [],
+            }
+        )
+
+    async def async_display_cached(self, effect: dict[str, Any]) -> bool:
+        """Display an effect, installing it on the device on first use.
+
+        Effects are named after a hash of their definition. The least recently
+        used ones are deleted to stay within MAX_CACHED_EFFECTS. Callers take
+        turns, so one cannot evict the effect another is about to select.
+        """
+        digest = hashlib.sha256(
+            json.dumps(effect, sort_keys=True).encode("utf-8")
+        ).hexdigest()[:12]
+        name = f"{CACHED_EFFECT_PREFIX}{digest}"
+        async with self._effect_cache_lock:
+            if digest in self._effect_cache:
+                self._effect_cache.move_to_end(digest)
+                status = await self._write_effects_status({"select": name})
+                if status != HTTPStatus.NOT_FOUND:
+                    return status is not None and int(status / 100) == 2
+                # Removed on the device behind our back: install it again.
+                del self._effect_cache[digest]
+                self.stats.retries += 1
+
+            while len(self._effect_cache) >= MAX_CACHED_EFFECTS:
+                evicted, _ = self._effect_cache.popitem(last=False)
+                await self._write_effects(
+                    {
+                        "write": {
+                            "command": "delete",
+                            "animName": f"{CACHED_EFFECT_PREFIX}{evicted}",
+                        }
+                    }
+                )
+
+            if not await self._write_effects(
+                {"write": {"command": "add", "animName": name, **effect}}
+            ):
+                return False
+            self._effect_cache[digest] = None
+            self._async_save_snapshot()
+            return await self._write_effects({"select": name})
+
+    @property
+    def effect_list(self) -> list[str]:
+        """Return the names of the native effects of the device."""
+        return sorted(self.effects)
+
+    @property
+    def effect(self) -> str | None:
+        """Return the selected native effect, if one is shown."""
+        if self.info is None:
+            return None
+        selected = self.info["effects"].get("select")
+        return selected if selected in self.effects else None
+
+    async def async_refresh_effects(self) -> bool:
+        """Fetch the animation data of every effect with one request."""
+        return await self._scheduler.async_submit(
+            TARGET_EFFECT_CATALOGUE, self._fetch_effects
+        )
+
+    async def _fetch_effects(self) -> bool:
+        """Replace the effect catalogue with the effects on the device."""
+        response = await self._request(
+            "PUT",
+            f"{self.token}/effects",
+            json.dumps({"write": {"command": "requestAll"}}),
+        )
+        if response is None or response[0] != HTTPStatus.OK or not response[1]:
+            return False
+        animations = response[1].get("animations", [])
+        self.effects = {
+            animation["animName"]: animation
+            for animation in animations
+            if not animation["animName"].startswith(CACHED_EFFECT_PREFIX)
+        }
+        if self.info is not None:
+            self.info["effects"]["effectsList"] = [
+                animation["animName"] for animation in animations
+            ]
+            self._async_save_snapshot()
+        self._async_notify_listeners()
+        return True
+
+    @callback
+    def _async_check_effects(self) -> None:
+        """Refresh the effect catalogue when the device names other effects.
+
+        An empty catalogue counts as stale too, so a first fetch that failed
+        is retried.
+        """
+        if self.info is None:
+            return
+        effects = self.info["effects"]
+        names = {
+            name
+            for name in (*effects.get("effectsList", []), effects.get("select", ""))
+            if name
+            and not name.startswith((CACHED_EFFECT_PREFIX, SPECIAL_EFFECT_PREFIX))
+        }
+        if names != self.effects.keys():
+            self.hass.async_create_background_task(
+                self.async_refresh_effects(), f"refresh effects {self.netloc}"
+            )
+
+    async def async_select_effect(self, name: str) -> bool:
+        """Select a native effect with a single write, latest wins."""
+        result = await self._scheduler.async_submit(
+            TARGET_EFFECT, partial(self._write_effects, {"select": name})
+        )
+        if result and self.info is not None:
+            self.info["effects"]["select"] = name
+            self._async_effect_selected()
+            self._async_notify_listeners()
+        return result
+
+    async def async_preview_effect(self, name: str) -> bool:
+        """Show a native effect without selecting it, from the catalogue."""
+        if (animation := self.effects.get(name)) is None:
+            return False
+        self.async_stop_streaming()
+        self._async_invalidate_framebuffer()
+        return await self._write_effects(
+            {"write": {**animation, "command": "display"}}
+        )
+
+    async def _write_effects(self, body: dict[str, Any]) -> bool:
+        """Send a command to the effects endpoint."""
+        status = await self._write_effects_status(body)
+        return status is not None and int(status / 100) == 2
+
+    async def _write_effects_status(self, body: dict[str, Any]) -> int | None:
+        """Send a command to the effects endpoint and return the HTTP status."""
+        response = await self._request(
+            "PUT", f"{self.token}/effects", json.dumps(body)
+        )
+        return None if response is None else response[0]
+
+    @property
+    def streaming(self) -> bool:
+        """Return True if colours are streamed over extControl UDP."""
+        return self._stream_transport is not None
+
+    async def async_start_streaming(self, port: int = EXT_CONTROL_PORT) -> bool:
+        """Switch the device to extControl v2 and open the UDP stream."""
+        if self.streaming:
+            return True
+        if self.framebuffer is None and await self.get_info() is None:
+            return False
+
+        if not await self._write_effects(
             {
                 "write": {
                     "command": "display",
-                    "animType": "static",
-                    "animData": f"1 {panel_id} 1 {red} {green} {blue} {white} {transition}",
-                    "loop": False,
-                    "palette": [
-                        # {"hue": 0, "saturation": 100, "brightness": brightness},
-                        # {"hue": 30, "saturation": 100, "brightness": 200},
-                    ],
-                    "brightnessRange": {"minValue": 0, "maxValue": 255},
-                    "colorType": "HSB",
-                },
+                    "animType": "extControl",
+                    "extControlVersion": "v2",
+                }
             }
+        ):
+            return False
+        self._async_invalidate_framebuffer()
+        if self.info is not None:
+            self.info["effects"]["select"] = EXT_CONTROL_EFFECT
+
+        host = self.netloc.split(":")[0]
+        self._stream_transport, _ = await self.hass.loop.create_datagram_endpoint(
+            asyncio.DatagramProtocol, remote_addr=(host, port)
         )
-        response = await self.hass.async_add_executor_job(
-            requests.put,
-            f"http://{self.netloc}/api/v1/{self.token}/effects",
-            payload,
-        )
-
-        return response.status_code == HTTPStatus.NO_CONTENT
-
-    def process_events_stream(self, entry_id) -> None:
-        """Read stream and trigger corresponding events."""
-        response = requests.get(
-            f"http://{self.netloc}/api/v1/{self.token}/events?id=4",
-            stream=True,
-            timeout=None,
-        )
-
-        for line in response.iter_lines(chunk_size=1):
-            if line:
-                decoded_line = line.decode("utf-8")
-                # print(decoded_line)
-                key = "data:"
-                if decoded_line.startswith(key):
-                    value = decoded_line[len(key) :]
-                    obj = json.loads(value)
-                    _LOGGER.info(obj)
-
-                    entity_id = obj["events"][0]["panelId"]
-
-                    entity_reg = er.async_get(self.hass)
-                    entities = er.async_entries_for_config_entry(entity_reg, entry_id)
-                    entry_found = None
-                    for entity in entities:
-                        if entity.domain != "light":
-                            continue
-                        if entity.unique_id == entity_id:
-                            entry_found = entity
-                            break
-
-                    if entry_found is not None:
-                        if obj["events"][0]["gesture"] == 0:
-                            event_data = {
-                                "device_id": entry_found.device_id,
-                                "entity_id": entry_found.entity_id,
-                                "type": "single_tap",
-                            }
-                            self.hass.bus.fire(EVENT, event_data)
-                            _LOGGER.info("Single tap %s", event_data)
-                            # hass.bus.async_fire(EVENT, event_data)
-                        if obj["events"][0]["gesture"] == 1:
-                            event_data = {
-                                "device_id": entry_found.device_id,
-                                "entity_id": entry_found.entity_id,
-                                "type": "double_tap",
-                            }
-                            self.hass.bus.fire(EVENT, event_data)
-                            _LOGGER.info("Double tap %s", event_data)
-
-        _LOGGER.info("Stream ended")
+        return True
+
+    @callback
+    def async_stop_streaming(self) -> None:
+        """Close the UDP stream, dropping frames that were not sent yet."""
+        if self._stream_handle is not None:
+            self._stream_handle.cancel()
+            self._stream_handle = None
+        if self._stream_transport is not None:
+            self._stream_transport.close()
+            self._stream_transport = None
+        self._stream_dirty.clear()
+
+    @callback
+    def stream_frame(self, frame: dict[int, tuple[int, int, int, int]]) -> None:
+        """Queue panel colours for the next streamed frame.
+
+        Frames are sent at most stream_fps times per second; a panel changed
+        several times in between is sent once with its latest colour.
+        """
+        assert self.framebuffer is not None
+        self.framebuffer.update(frame)
+        for panel_id, (_, _, _, transition) in frame.items():
+            self._stream_dirty[panel_id] = _transition(transition)
+        if self._stream_handle is None:
+            delay = self._stream_last_sent + 1 / self.stream_fps - self.hass.loop.time()
+            self._stream_handle = self.hass.loop.call_later(
+                max(delay, 0), self._send_stream_frame
+            )
+
+    @callback
+    def _send_stream_frame(self) -> None:
+        """Send every queued panel in one extControl datagram."""
+        self._stream_handle = None
+        if self._stream_transport is None or self.framebuffer is None:
+            return
+        packet = self.framebuffer.pack_ext_control(self._stream_dirty)
+        self._stream_dirty = {}
+        self._stream_transport.sendto(packet)
+        self._stream_last_sent = self.hass.loop.time()
+
+    async def async_start_touch_stream(self) -> None:
+        """Open the UDP port the device streams raw touch data to.
+
+        The port is requested with every connection of the event stream, so
+        the hub reconnecting it also restores the touch stream.
+        """
+        if self._touch_transport is not None:
+            return
+        self._touch_transport, _ = await self.hass.loop.create_datagram_endpoint(
+            partial(TouchDataProtocol, self._async_touch_data),
+            local_addr=("0.0.0.0", 0),
+        )
+        self.touch_port = self._touch_transport.get_extra_info("sockname")[1]
+
+    @callback
+    def async_stop_touch_stream(self) -> None:
+        """Close the raw touch data port."""
+        self._gestures.async_shutdown()
+        if self._touch_transport is not None:
+            self._touch_transport.close()
+            self._touch_transport = None
+        self.touch_port = None
+
+    @callback
+    def _async_touch_data(self, touches: list[tuple[int, int, int | None]]) -> None:
+        """Feed a touch datagram to the gesture recognizer."""
+        received = time.monotonic()
+        if self._recorder is not None:
+            self._recorder.record(TRACE_TOUCH, touches)
+        for panel_id, touch_type, swiped_from in touches:
+            self._gestures.async_process(panel_id, touch_type, swiped_from)
+        if any(touch[1] in (TOUCH_DOWN, TOUCH_SWIPE) for touch in touches):
+            self.hass.loop.call_soon(self._record_touch_latency, received)
+
+    def _panel_neighbors(self, panel_id: int) -> frozenset[int]:
+        """Return the panels adjacent to a panel."""
+        if (panel_layout := self.panel_layout) is None:
+            return frozenset()
+        return panel_layout.neighbors(panel_id)
+
+    @callback
+    def async_track_panel_entities(self, entry_id: str) -> CALLBACK_TYPE:
+        """Keep the panel index in sync with the entity registry."""
+        self._entry_id = entry_id
+        self._async_rebuild_panel_index()
+        return self.hass.bus.async_listen(
+            er.EVENT_ENTITY_REGISTRY_UPDATED, self._async_rebuild_panel_index
+        )
+
+    @callback
+    def _async_rebuild_panel_index(self, event: Event | None = None) -> None:
+        """Map panelId to the device and entity of its light."""
+        entity_reg = er.async_get(self.hass)
+        self._panel_entities = {
+            str(entity.unique_id): (entity.device_id, entity.entity_id)
+            for entity in er.async_entries_for_config_entry(entity_reg, self._entry_id)
+            if entity.domain == "light" and str(entity.unique_id).isdigit()
+        }
+
+    async def async_process_events_stream(
+        self, on_connect: CALLBACK_TYPE | None = None
+    ) -> None:
+        """Read stream and trigger corresponding events.
+
+        A stream that stays silent for stream_idle_timeout seconds, unless it
+        is 0, is treated as dead and raises asyncio.TimeoutError.
+        """
+        session = async_get_clientsession(self.hass)
+        async with session.get(
+            f"http://{self.netloc}/api/v1/{self.token}/events?id=1,2,3,4",
+            headers=(
+                {TOUCH_EVENTS_PORT_HEADER: str(self.touch_port)}
+                if self.touch_port is not None
+                else None
+            ),
+            timeout=aiohttp.ClientTimeout(
+                total=None,
+                sock_connect=CONNECT_TIMEOUT,
+                sock_read=self.stream_idle_timeout or None,
+            ),
+        ) as response:
+            response.raise_for_status()
+            if on_connect is not None:
+                on_connect()
+            event_id = None
+            data: list[str] = []
+            # Server-sent events: fields are buffered until a blank line.
+            async for raw_line in response.content:
+                line = raw_line.decode("utf-8").rstrip("\r\n")
+                if self._recorder is not None:
+                    self._recorder.record(TRACE_SSE, line)
+                if not line:
+                    if data:
+                        self._handle_event(event_id, "\n".join(data))
+                    event_id = None
+                    data = []
+                    continue
+                field, _, value = line.partition(":")
+                value = value.removeprefix(" ")
+                if field == "id":
+                    event_id = value
+                elif field == "data":
+                    data.append(value)
+
+        _LOGGER.debug("Event stream of %s ended", self.netloc)
+
+    @callback
+    def _handle_event(self, event_id: str | None, data: str) -> None:
+        """Apply a server-sent event of any subscribed channel.
+
+        A malformed event is dropped, so that it cannot end the stream.
+        """
+        start = time.monotonic()
+        try:
+            obj = json.loads(data)
+            if event_id == EVENTS_STATE:
+                self._handle_state_events(obj["events"])
+            elif event_id == EVENTS_LAYOUT:
+                self._handle_layout_events(obj["events"])
+            elif event_id == EVENTS_EFFECTS:
+                self._handle_effects_events(obj["events"])
+            elif event_id == EVENTS_TOUCH:
+                self._handle_touch_events(obj["events"])
+        except (KeyError, TypeError, ValueError) as err:
+            _LOGGER.debug(
+                "Dropped malformed event %s from %s: %r", event_id, self.netloc, err
+            )
+            self.stats.malformed_events += 1
+            return
+
+        self.stats.events[event_id or ""] += 1
+        self.stats.last_event = time.time()
+        self.stats.event_dispatch.record(time.monotonic() - start)
+
+    @callback
+    def _handle_state_events(self, events: list[dict[str, Any]]) -> None:
+        """Apply state deltas to the cached info."""
+        if self.info is None:
+            return
+        state = self.info["state"]
+        for event in events:
+            attr = STATE_ATTRS.get(event["attr"])
+            if attr == "colorMode":
+                state[attr] = event["value"]
+            elif attr is not None:
+                state[attr]["value"] = event["value"]
+        self._async_save_snapshot()
+        self._async_notify_listeners()
+
+    @callback
+    def _handle_layout_events(self, events: list[dict[str, Any]]) -> None:
+        """Apply layout deltas to the cached info."""
+        if self.info is None:
+            return
+        panel_layout = self.info["panelLayout"]
+        for event in events:
+            if event["attr"] == 1 and isinstance(event["value"], dict):
+                panel_layout["layout"] = event["value"]
+                self._async_layout_updated()
+            elif event["attr"] == 1 and self._refresh_task is None:
+                # Listeners are told again once the new layout is fetched.
+                self._refresh_task = self.hass.async_create_background_task(
+                    self._async_refresh_layout(), f"refresh layout {self.netloc}"
+                )
+            elif event["attr"] == 2:
+                panel_layout["globalOrientation"]["value"] = event["value"]
+        self._async_save_snapshot()
+        self._async_notify_listeners()
+
+    async def _async_refresh_layout(self) -> None:
+        """Fetch a layout that an event only announced."""
+        try:
+            await self.async_refresh()
+        finally:
+            self._refresh_task = None
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Cancel work started by device events and close the stream."""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+        self.async_stop_streaming()
+
+    @callback
+    def _handle_effects_events(self, events: list[dict[str, Any]]) -> None:
+        """Apply the selected effect to the cached info."""
+        if self.info is None:
+            return
+        for event in events:
+            if event["attr"] == 1:
+                self.info["effects"]["select"] = event["value"]
+        self._async_save_snapshot()
+        self._async_effect_selected()
+        self._async_check_effects()
+        self._async_notify_listeners()
+
+    @callback
+    def _handle_touch_events(self, events: list[dict[str, Any]]) -> None:
+        """Queue the gestures of a touch event payload for firing.
+
+        Payloads read from the same chunk of the stream are fired together in a
+        single loop callback instead of one callback per payload.
+        """
+        if not self._pending_touches:
+            self._touches_received = time.monotonic()
+            self.hass.loop.call_soon(self._async_fire_touches)
+        self._pending_touches.extend(events)
+
+    @callback
+    def _async_fire_touches(self) -> None:
+        """Fire the queued gestures on the event bus."""
+        events, self._pending_touches = self._pending_touches, []
+        fired = False
+        for event in events:
+            if (gesture := GESTURES.get(event["gesture"])) is not None:
+                fired |= self._async_fire_gesture(event["panelId"], gesture)
+
+        if fired:
+            # Runs after the trigger callbacks the bus scheduled for the batch.
+            self.hass.loop.call_soon(
+                self._record_touch_latency, self._touches_received
+            )
+
+    @callback
+    def _async_fire_raw_gesture(
+        self, panel_id: int, gesture: str, swiped_from: int | None
+    ) -> None:
+        """Fire a gesture recognised from the raw touch data stream."""
+        extra = {}
+        if (origin := self._panel_entities.get(str(swiped_from))) is not None:
+            extra["from_entity_id"] = origin[1]
+        self._async_fire_gesture(panel_id, gesture, **extra)
+
+    @callback
+    def _async_fire_gesture(self, panel_id: int, gesture: str, **extra: Any) -> bool:
+        """Fire a gesture of a panel on the event bus."""
+        if (entity := self._panel_entities.get(str(panel_id))) is None:
+            return False
+        device_id, entity_id = entity
+        event_data = {
+            "device_id": device_id,
+            "entity_id": entity_id,
+            "type": gesture,
+            **extra,
+        }
+        self.hass.bus.async_fire(EVENT, event_data)
+        return True
+
+    @callback
+    def _record_touch_latency(self, received: float) -> None:
+        """Record the time from receiving gestures to their triggers running."""
+        self.stats.touch_latency.record(time.monotonic() - received)
@@ -0,0 +1,102 @@
+"""Geometry-aware effect renderer working on the panel layout."""
+from __future__ import annotations
+
+from collections.abc import Sequence
+from typing import Any
+
+import numpy as np
+
+EFFECT_LINEAR = "linear"
+EFFECT_RADIAL = "radial"
+EFFECT_WAVE = "wave"
+EFFECT_RIPPLE = "ripple"
+EFFECTS = (EFFECT_LINEAR, EFFECT_RADIAL, EFFECT_WAVE, EFFECT_RIPPLE)
+
+# Width of the ripple ring relative to the size of the layout.
+RIPPLE_WIDTH = 0.15
+
+_BYTE_STRINGS = np.array([str(value) for value in range(256)], dtype=object)
+
+
+def _triangle(phase: np.ndarray) -> np.ndarray:
+    """Map a 0..1 phase onto 0..1..0 so that looping frames join smoothly."""
+    return 1 - np.abs(2 * phase - 1)
+
+
+def _palette(colors: Sequence[Sequence[int]], position: np.ndarray) -> np.ndarray:
+    """Interpolate the palette at every 0..1 position."""
+    palette = np.asarray(colors, dtype=np.float32)
+    scaled = np.clip(position, 0, 1) * (len(palette) - 1)
+    low = np.floor(scaled).astype(np.intp)
+    high = np.minimum(low + 1, len(palette) - 1)
+    fraction = (scaled - low)[..., np.newaxis]
+    return palette[low] * (1 - fraction) + palette[high] * fraction
+
+
+def render(
+    effect: str,
+    position_data: list[dict[str, Any]],
+    panel_ids: Sequence[int],
+    frames: int,
+    colors: Sequence[Sequence[int]],
+    angle: float = 0,
+    origin: int | None = None,
+    wavelength: float = 1,
+) -> np.ndarray:
+    """Compute the colour of every panel for every frame of an effect.
+
+    Returns a uint8 array of shape (frames, panels, 3) with the panels in
+    panel_ids order. Positions are normalised to the size of the layout, so
+    the same parameters look alike on small and large walls.
+    """
+    positions = {panel["panelId"]: (panel["x"], panel["y"]) for panel in position_data}
+    xy = np.array([positions[panel_id] for panel_id in panel_ids], dtype=np.float32)
+    xy -= xy.min(axis=0)
+    size = max(float(xy.max()), 1)
+    xy /= size
+
+    phase = (np.arange(frames, dtype=np.float32) / frames)[:, np.newaxis]
+
+    if effect in (EFFECT_LINEAR, EFFECT_WAVE):
+        direction = np.array(
+            [np.cos(np.radians(angle)), np.sin(np.radians(angle))], dtype=np.float32
+        )
+        projection = xy @ direction
+        projection -= projection.min()
+        projection /= max(float(projection.max()), 1e-6)
+        if effect == EFFECT_LINEAR:
+            value = _triangle((projection + phase) % 1)
+        else:
+            value = 0.5 + 0.5 * np.sin(2 * np.pi * (projection / wavelength - phase))
+    else:
+        if origin is not None:
+            center = xy[list(panel_ids).index(origin)]
+        else:
+            center = xy.mean(axis=0)
+        distance = np.linalg.norm(xy - center, axis=1)
+        distance /= max(float(distance.max()), 1e-6)
+        if effect == EFFECT_RADIAL:
+            value = _triangle((distance - phase) % 1)
+        else:
+            radius = phase * (1 + 2 * RIPPLE_WIDTH) - RIPPLE_WIDTH
+            value = np.exp(-(((distance - radius) / RIPPLE_WIDTH) ** 2))
+
+    return np.rint(_palette(colors, value)).astype(np.uint8)
+
+
+def custom_anim_data(
+    panel_ids: Sequence[int], frames_rgb: np.ndarray, transition: int
+) -> str:
+    """Encode rendered frames as a custom effect animData string."""
+    num_frames, num_panels, _ = frames_rgb.shape
+    # Per panel: id, frame count, then R G B W T for every frame. Colour
+    # channels are looked up as ready-made strings instead of formatted.
+    frame_data = np.empty((num_panels, num_frames, 5), dtype=object)
+    frame_data[..., :3] = _BYTE_STRINGS[frames_rgb.transpose(1, 0, 2)]
+    frame_data[..., 3] = "0"
+    frame_data[..., 4] = str(transition)
+    rows = np.empty((num_panels, 2 + num_frames * 5), dtype=object)
+    rows[:, 0] = [str(panel_id) for panel_id in panel_ids]
+    rows[:, 1] = str(num_frames)
+    rows[:, 2:] = frame_data.reshape(num_panels, -1)
+    return f"{num_panels} " + " ".join(rows.ravel().tolist())
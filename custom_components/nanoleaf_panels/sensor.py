@@ -0,0 +1,123 @@
+"""Diagnostic sensors for Nanoleaf Panels."""
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from homeassistant.components.sensor import (
+    SensorEntity,
+    SensorEntityDescription,
+    SensorStateClass,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import EntityCategory, UnitOfTime
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.device_registry import DeviceInfo
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+from .const import DOMAIN, EVENT_HUB
+from .event_hub import DeviceStream
+from .nanoleaf_controller import NanoleafController
+
+
+@dataclass(frozen=True, kw_only=True)
+class NanoleafSensorEntityDescription(SensorEntityDescription):
+    """Describe a sensor read from the in-memory controller counters."""
+
+    value_fn: Callable[[NanoleafController, DeviceStream | None], float | None]
+
+
+def _request_latency(
+    controller: NanoleafController, stream: DeviceStream | None
+) -> float | None:
+    """Return the moving average request latency in milliseconds."""
+    if (latency := controller.stats.request_latency) is None:
+        return None
+    return round(latency * 1000, 1)
+
+
+SENSORS: tuple[NanoleafSensorEntityDescription, ...] = (
+    NanoleafSensorEntityDescription(
+        key="request_latency",
+        name="Request latency",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=_request_latency,
+    ),
+    NanoleafSensorEntityDescription(
+        key="request_failures",
+        name="Request failures",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda controller, stream: sum(controller.stats.failures.values()),
+    ),
+    NanoleafSensorEntityDescription(
+        key="commands_in_flight",
+        name="Commands in flight",
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda controller, stream: controller.commands_in_flight,
+    ),
+    NanoleafSensorEntityDescription(
+        key="commands_queued",
+        name="Commands queued",
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda controller, stream: controller.commands_queued,
+    ),
+    NanoleafSensorEntityDescription(
+        key="event_stream_reconnects",
+        name="Event stream reconnects",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda controller, stream: (
+            stream.reconnects if stream is not None else None
+        ),
+    ),
+)
+
+
+async def async_setup_entry(
+    hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback
+) -> None:
+    """Sensors setup entry."""
+    nanoleaf_controller: NanoleafController = hass.data[DOMAIN][entry.entry_id]
+    async_add_entities(
+        NanoleafSensor(nanoleaf_controller, entry.entry_id, description)
+        for description in SENSORS
+    )
+
+
+class NanoleafSensor(SensorEntity):
+    """Diagnostic counter of a Nanoleaf controller.
+
+    The values live in memory on the controller, so polling them is cheap and
+    keeps the request path free of state writes.
+    """
+
+    entity_description: NanoleafSensorEntityDescription
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    def __init__(
+        self,
+        nanoleaf_controller: NanoleafController,
+        entry_id: str,
+        description: NanoleafSensorEntityDescription,
+    ) -> None:
+        """Initialize a NanoleafSensor."""
+        self.nanoleaf_controller = nanoleaf_controller
+        self.entity_description = description
+        self._entry_id = entry_id
+
+        name = nanoleaf_controller.info["name"]
+        self._attr_unique_id = f"{name}_{description.key}"
+        self._attr_name = f"{name} {description.name}"
+
+    async def async_update(self) -> None:
+        """Read the counter from the controller."""
+        stream = self.hass.data[DOMAIN][EVENT_HUB].streams.get(self._entry_id)
+        self._attr_native_value = self.entity_description.value_fn(
+            self.nanoleaf_controller, stream
+        )
+
+    @property
+    def device_info(self) -> DeviceInfo | None:
+        """Build device info."""
+        return DeviceInfo(identifiers={(DOMAIN, self.nanoleaf_controller.info["name"])})
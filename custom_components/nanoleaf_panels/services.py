@@ -0,0 +1,290 @@
+"""Services for the Nanoleaf Panels integration."""
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import datetime
+from functools import partial
+
+import voluptuous as vol
+
+from homeassistant.components.light import (
+    ATTR_BRIGHTNESS,
+    ATTR_RGB_COLOR,
+    ATTR_TRANSITION,
+)
+from homeassistant.const import ATTR_ENTITY_ID
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+)
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv, entity_registry as er
+from homeassistant.helpers.event import async_call_later
+from homeassistant.util import dt as dt_util, slugify
+
+from .const import DEFAULT_STREAM_FPS, DOMAIN
+from .coordinator import async_apply_scene
+from .nanoleaf_controller import NanoleafController
+from .renderer import EFFECTS, custom_anim_data, render
+
+ATTR_ANGLE = "angle"
+ATTR_CACHE = "cache"
+ATTR_COLORS = "colors"
+ATTR_DURATION = "duration"
+ATTR_EFFECT = "effect"
+ATTR_FPS = "fps"
+ATTR_FRAMES = "frames"
+ATTR_ORIGIN = "origin"
+ATTR_PANELS = "panels"
+ATTR_WAVELENGTH = "wavelength"
+
+SERVICE_PREVIEW_EFFECT = "preview_effect"
+SERVICE_RECORD_TRACE = "record_trace"
+SERVICE_RENDER_EFFECT = "render_effect"
+SERVICE_SET_PANELS = "set_panels"
+SERVICE_START_STREAMING = "start_streaming"
+SERVICE_STOP_STREAMING = "stop_streaming"
+
+RGB_SCHEMA = vol.All(vol.Coerce(tuple), vol.ExactSequence((cv.byte,) * 3))
+
+PANEL_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_RGB_COLOR): RGB_SCHEMA,
+        vol.Optional(ATTR_TRANSITION): cv.positive_float,
+    }
+)
+
+SET_PANELS_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_PANELS): {cv.string: PANEL_SCHEMA},
+        vol.Optional(ATTR_BRIGHTNESS): vol.All(vol.Coerce(int), vol.Range(0, 255)),
+        vol.Optional(ATTR_TRANSITION, default=1): cv.positive_float,
+        vol.Optional(ATTR_CACHE, default=False): cv.boolean,
+    }
+)
+
+RENDER_EFFECT_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_ENTITY_ID): cv.entity_id,
+        vol.Required(ATTR_EFFECT): vol.In(EFFECTS),
+        vol.Required(ATTR_COLORS): vol.All(
+            cv.ensure_list, [RGB_SCHEMA], vol.Length(min=2)
+        ),
+        vol.Optional(ATTR_FRAMES, default=30): vol.All(
+            vol.Coerce(int), vol.Range(min=2, max=300)
+        ),
+        vol.Optional(ATTR_TRANSITION, default=0.5): cv.positive_float,
+        vol.Optional(ATTR_ANGLE, default=0): vol.Coerce(float),
+        vol.Optional(ATTR_ORIGIN): cv.string,
+        vol.Optional(ATTR_WAVELENGTH, default=1): vol.All(
+            vol.Coerce(float), vol.Range(min=0.05)
+        ),
+    }
+)
+
+START_STREAMING_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_ENTITY_ID): cv.entity_id,
+        vol.Optional(ATTR_FPS, default=DEFAULT_STREAM_FPS): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=60)
+        ),
+    }
+)
+
+STOP_STREAMING_SCHEMA = vol.Schema({vol.Required(ATTR_ENTITY_ID): cv.entity_id})
+
+PREVIEW_EFFECT_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_ENTITY_ID): cv.entity_id,
+        vol.Required(ATTR_EFFECT): cv.string,
+    }
+)
+
+RECORD_TRACE_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_ENTITY_ID): cv.entity_id,
+        vol.Optional(ATTR_DURATION, default=60): vol.All(
+            vol.Coerce(float), vol.Range(min=1, max=3600)
+        ),
+    }
+)
+
+
+def _resolve_light(
+    hass: HomeAssistant, entity_id: str
+) -> tuple[NanoleafController, er.RegistryEntry]:
+    """Return the controller and registry entry of a light of a device."""
+    entry = er.async_get(hass).async_get(entity_id)
+    if entry is None or entry.platform != DOMAIN or entry.domain != "light":
+        raise HomeAssistantError(f"{entity_id} is not a Nanoleaf light")
+    controller = hass.data[DOMAIN].get(entry.config_entry_id)
+    if controller is None:
+        raise HomeAssistantError(f"{entity_id} is not loaded")
+    return controller, entry
+
+
+def _resolve_panel(hass: HomeAssistant, key: str) -> tuple[NanoleafController, int]:
+    """Return the controller and panelId of a panel entity id or panelId."""
+    controllers = [
+        controller
+        for controller in hass.data.get(DOMAIN, {}).values()
+        if isinstance(controller, NanoleafController)
+    ]
+    if key.isdigit():
+        panel_id = int(key)
+        for controller in controllers:
+            framebuffer = controller.framebuffer
+            if framebuffer is not None and panel_id in framebuffer:
+                return controller, panel_id
+        raise HomeAssistantError(f"Unknown panel {key}")
+
+    controller, entry = _resolve_light(hass, key)
+    if not str(entry.unique_id).isdigit():
+        raise HomeAssistantError(f"{key} is not a Nanoleaf panel")
+    return controller, int(entry.unique_id)
+
+
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the integration services."""
+
+    async def async_set_panels(call: ServiceCall) -> ServiceResponse:
+        """Apply a whole panel map with one write per controller.
+
+        Controllers are written concurrently, each held back so that the
+        transitions on every device start together.
+        """
+        transition = call.data[ATTR_TRANSITION]
+        frames: dict[NanoleafController, dict[int, tuple[int, int, int, int]]]
+        frames = defaultdict(dict)
+        for key, panel in call.data[ATTR_PANELS].items():
+            controller, panel_id = _resolve_panel(hass, key)
+            red, green, blue = panel[ATTR_RGB_COLOR]
+            panel_transition = panel.get(ATTR_TRANSITION, transition)
+            frames[controller][panel_id] = (
+                red,
+                green,
+                blue,
+                int(panel_transition * 10),
+            )
+
+        brightness = call.data.get(ATTR_BRIGHTNESS)
+        result = await async_apply_scene(
+            frames,
+            brightness * 100 / 255 if brightness is not None else None,
+            transition,
+            call.data[ATTR_CACHE],
+        )
+        return result if call.return_response else None
+
+    async def async_render_effect(call: ServiceCall) -> None:
+        """Render an effect over the layout and upload it as one custom effect."""
+        controller, _ = _resolve_panel(hass, call.data[ATTR_ENTITY_ID])
+        origin = None
+        if ATTR_ORIGIN in call.data:
+            origin_controller, origin = _resolve_panel(hass, call.data[ATTR_ORIGIN])
+            if origin_controller is not controller:
+                raise HomeAssistantError("Origin panel is on another device")
+        if controller.info is None or controller.framebuffer is None:
+            raise HomeAssistantError("Panel layout is not known yet")
+
+        panel_ids = controller.framebuffer.panel_ids
+        frames_rgb = await hass.async_add_executor_job(
+            partial(
+                render,
+                call.data[ATTR_EFFECT],
+                controller.info["panelLayout"]["layout"]["positionData"],
+                panel_ids,
+                call.data[ATTR_FRAMES],
+                call.data[ATTR_COLORS],
+                angle=call.data[ATTR_ANGLE],
+                origin=origin,
+                wavelength=call.data[ATTR_WAVELENGTH],
+            )
+        )
+        anim_data = await hass.async_add_executor_job(
+            custom_anim_data,
+            panel_ids,
+            frames_rgb,
+            int(call.data[ATTR_TRANSITION] * 10),
+        )
+        if not await controller.async_display_custom(anim_data):
+            raise HomeAssistantError("Device rejected the effect")
+
+    async def async_preview_effect(call: ServiceCall) -> None:
+        """Show a native effect without selecting it."""
+        controller, _ = _resolve_light(hass, call.data[ATTR_ENTITY_ID])
+        effect = call.data[ATTR_EFFECT]
+        if effect not in controller.effects:
+            raise HomeAssistantError(f"Unknown effect {effect}")
+        if not await controller.async_preview_effect(effect):
+            raise HomeAssistantError("Device rejected the effect")
+
+    async def async_record_trace(call: ServiceCall) -> ServiceResponse:
+        """Record the traffic of a device to a trace file for a while."""
+        controller, _ = _resolve_light(hass, call.data[ATTR_ENTITY_ID])
+        name = slugify((controller.info or {}).get("name", controller.netloc))
+        path = hass.config.path(
+            f"{DOMAIN}_trace_{name}_{dt_util.now():%Y%m%d_%H%M%S}.jsonl.gz"
+        )
+        await controller.async_start_recording(path)
+
+        async def async_stop(now: datetime) -> None:
+            """Stop the recording unless another one replaced it."""
+            if controller.recording and controller.trace_path == path:
+                await controller.async_stop_recording()
+
+        async_call_later(hass, call.data[ATTR_DURATION], async_stop)
+        return {"path": path} if call.return_response else None
+
+    async def async_start_streaming(call: ServiceCall) -> None:
+        """Switch a device to extControl and stream panel colours over UDP."""
+        controller, _ = _resolve_light(hass, call.data[ATTR_ENTITY_ID])
+        controller.stream_fps = call.data[ATTR_FPS]
+        if not await controller.async_start_streaming():
+            raise HomeAssistantError("Device rejected extControl")
+
+    async def async_stop_streaming(call: ServiceCall) -> None:
+        """Go back to writing panel colours as static frames."""
+        controller, _ = _resolve_light(hass, call.data[ATTR_ENTITY_ID])
+        controller.async_stop_streaming()
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_SET_PANELS,
+        async_set_panels,
+        schema=SET_PANELS_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_RENDER_EFFECT,
+        async_render_effect,
+        schema=RENDER_EFFECT_SCHEMA,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_PREVIEW_EFFECT,
+        async_preview_effect,
+        schema=PREVIEW_EFFECT_SCHEMA,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_RECORD_TRACE,
+        async_record_trace,
+        schema=RECORD_TRACE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_START_STREAMING,
+        async_start_streaming,
+        schema=START_STREAMING_SCHEMA,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_STOP_STREAMING,
+        async_stop_streaming,
+        schema=STOP_STREAMING_SCHEMA,
+    )
@@ -0,0 +1,124 @@
+"""Performance counters kept per Nanoleaf controller."""
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from typing import Any
+
+# Upper bounds of the latency histogram buckets in seconds.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+# Weight of the newest sample in the moving latency average.
+EWMA_WEIGHT = 0.2
+
+
+class LatencyHistogram:
+    """Bucketed latency distribution with a moving average."""
+
+    def __init__(self) -> None:
+        """Initialize an empty histogram."""
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.ewma: float | None = None
+
+    def record(self, seconds: float) -> None:
+        """Add a sample."""
+        self.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        if self.ewma is None:
+            self.ewma = seconds
+        else:
+            self.ewma += EWMA_WEIGHT * (seconds - self.ewma)
+
+    def quantile(self, fraction: float) -> float | None:
+        """Return the upper bound of the bucket holding the given quantile."""
+        if not self.count:
+            return None
+        target = fraction * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.buckets):
+            seen += count
+            if seen >= target:
+                return bound
+        return self.max
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the histogram in a serializable form."""
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "ewma": self.ewma,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": {
+                f"le_{bound}": count
+                for bound, count in zip(
+                    (*LATENCY_BUCKETS, "inf"), self.buckets, strict=True
+                )
+            },
+        }
+
+
+class ControllerStats:
+    """Request, command and event stream counters of a controller.
+
+    Only counters and bucket increments happen on the hot path; summaries are
+    computed when diagnostics or sensors ask for them.
+    """
+
+    def __init__(self) -> None:
+        """Initialize empty counters."""
+        self.latency: defaultdict[str, LatencyHistogram] = defaultdict(
+            LatencyHistogram
+        )
+        self.failures: Counter[str] = Counter()
+        self.retries = 0
+        # Commands refused without a request while the device is unavailable.
+        self.rejected = 0
+        self.in_flight = 0
+        self.waiting = 0
+        self.events: Counter[str] = Counter()
+        # Events dropped because their payload could not be applied.
+        self.malformed_events = 0
+        self.event_dispatch = LatencyHistogram()
+        self.touch_latency = LatencyHistogram()
+        self.last_event: float | None = None
+
+    @property
+    def request_latency(self) -> float | None:
+        """Return the moving average latency over all endpoints."""
+        averages = [
+            histogram.ewma
+            for histogram in self.latency.values()
+            if histogram.ewma is not None
+        ]
+        return sum(averages) / len(averages) if averages else None
+
+    def endpoint_latency(self, endpoint: str) -> float | None:
+        """Return the moving average latency of one endpoint."""
+        if (histogram := self.latency.get(endpoint)) is None:
+            return None
+        return histogram.ewma
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the counters in a serializable form."""
+        return {
+            "latency": {
+                endpoint: histogram.as_dict()
+                for endpoint, histogram in self.latency.items()
+            },
+            "failures": dict(self.failures),
+            "retries": self.retries,
+            "rejected": self.rejected,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "events": dict(self.events),
+            "malformed_events": self.malformed_events,
+            "event_dispatch": self.event_dispatch.as_dict(),
+            "touch_latency": self.touch_latency.as_dict(),
+            "last_event": self.last_event,
+        }
@@ -0,0 +1,178 @@
+"""Raw touch data stream and host-side gesture recognition."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+from dataclasses import dataclass
+import logging
+import struct
+import time
+
+from homeassistant.core import HomeAssistant, callback
+
+from .const import HOLD_INTERVAL, LONG_PRESS_TIME, MAX_HOLD_TIME, SWIPE_WINDOW
+
+_LOGGER = logging.getLogger(__name__)
+
+# Touch types of the raw touch data stream.
+TOUCH_HOVER = 0
+TOUCH_DOWN = 1
+TOUCH_HOLD = 2
+TOUCH_UP = 3
+TOUCH_SWIPE = 4
+# Swiped from panelId of a touch that did not come from another panel.
+NO_PANEL = 0xFFFF
+
+# Gestures recognised from the raw touch data stream.
+RAW_GESTURES = ("touch_down", "long_press", "hold", "swipe")
+
+# Datagram: panel count, then panelId, type and strength nibbles and the
+# panelId swiped from for every panel.
+_HEADER = struct.Struct(">H")
+_TOUCH = struct.Struct(">HBH")
+
+
+def parse_touch_data(data: bytes) -> list[tuple[int, int, int | None]]:
+    """Return panelId, touch type and swiped from panelId of every touch."""
+    (count,) = _HEADER.unpack_from(data)
+    touches = []
+    for index in range(count):
+        panel_id, touch, swiped_from = _TOUCH.unpack_from(
+            data, _HEADER.size + index * _TOUCH.size
+        )
+        touches.append(
+            (panel_id, touch >> 4, None if swiped_from == NO_PANEL else swiped_from)
+        )
+    return touches
+
+
+def pack_touch_data(touches: list[tuple[int, int, int | None]]) -> bytes:
+    """Return the datagram of touches, as the device sends it."""
+    packet = bytearray(_HEADER.pack(len(touches)))
+    for panel_id, touch_type, swiped_from in touches:
+        packet += _TOUCH.pack(
+            panel_id, touch_type << 4, NO_PANEL if swiped_from is None else swiped_from
+        )
+    return bytes(packet)
+
+
+class TouchDataProtocol(asyncio.DatagramProtocol):
+    """Receive touch datagrams and pass the decoded touches on."""
+
+    def __init__(
+        self, on_touches: Callable[[list[tuple[int, int, int | None]]], None]
+    ) -> None:
+        """Initialize the protocol."""
+        self._on_touches = on_touches
+
+    def datagram_received(self, data: bytes, addr: tuple[str, int]) -> None:
+        """Decode a datagram."""
+        try:
+            touches = parse_touch_data(data)
+        except struct.error:
+            _LOGGER.debug("Invalid touch datagram from %s: %s", addr, data.hex())
+            return
+        self._on_touches(touches)
+
+
+@dataclass
+class PanelTouch:
+    """A panel that is being touched."""
+
+    down_at: float
+    timer: asyncio.TimerHandle | None = None
+    long_pressed: bool = False
+
+
+class GestureRecognizer:
+    """Turn raw touches into gestures, one state machine per panel.
+
+    A panel goes down with touch_down, or with swipe when the finger came
+    from a neighbouring panel. Held for LONG_PRESS_TIME it reports
+    long_press, then hold every HOLD_INTERVAL until it is released.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        fire: Callable[[int, str, int | None], None],
+        neighbors: Callable[[int], frozenset[int]],
+    ) -> None:
+        """Initialize the recognizer."""
+        self.hass = hass
+        self._fire = fire
+        self._neighbors = neighbors
+        self._touches: dict[int, PanelTouch] = {}
+        # panelId -> when its last touch ended, to spot swipes.
+        self._released: dict[int, float] = {}
+
+    @callback
+    def async_process(
+        self, panel_id: int, touch_type: int, swiped_from: int | None
+    ) -> None:
+        """Advance the state machine of a panel."""
+        if touch_type in (TOUCH_DOWN, TOUCH_HOLD, TOUCH_SWIPE):
+            if panel_id not in self._touches:
+                self._async_down(panel_id, swiped_from)
+        elif touch_type == TOUCH_UP:
+            self._async_release(panel_id)
+
+    @callback
+    def _async_down(self, panel_id: int, swiped_from: int | None) -> None:
+        """Start tracking a touched panel and report how it was touched."""
+        now = time.monotonic()
+        if swiped_from is None:
+            swiped_from = self._swipe_origin(panel_id, now)
+        if swiped_from is not None:
+            self._async_release(swiped_from)
+
+        self._touches[panel_id] = PanelTouch(
+            now,
+            self.hass.loop.call_later(LONG_PRESS_TIME, self._async_held, panel_id),
+        )
+        if swiped_from is not None:
+            self._fire(panel_id, "swipe", swiped_from)
+        else:
+            self._fire(panel_id, "touch_down", None)
+
+    def _swipe_origin(self, panel_id: int, now: float) -> int | None:
+        """Return the neighbour the finger just left, if any."""
+        origin = None
+        latest = now - SWIPE_WINDOW
+        for neighbor in self._neighbors(panel_id):
+            if neighbor in self._touches:
+                continue
+            if (released := self._released.get(neighbor, 0.0)) > latest:
+                origin, latest = neighbor, released
+        return origin
+
+    @callback
+    def _async_held(self, panel_id: int) -> None:
+        """Report a panel that is still held."""
+        if (touch := self._touches.get(panel_id)) is None:
+            return
+        now = time.monotonic()
+        if now - touch.down_at > MAX_HOLD_TIME:
+            # The touch up datagram got lost.
+            self._async_release(panel_id)
+            return
+        self._fire(panel_id, "hold" if touch.long_pressed else "long_press", None)
+        touch.long_pressed = True
+        touch.timer = self.hass.loop.call_later(
+            HOLD_INTERVAL, self._async_held, panel_id
+        )
+
+    @callback
+    def _async_release(self, panel_id: int) -> None:
+        """Stop tracking a panel."""
+        if (touch := self._touches.pop(panel_id, None)) is None:
+            return
+        if touch.timer is not None:
+            touch.timer.cancel()
+        self._released[panel_id] = time.monotonic()
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Cancel the timers of every held panel."""
+        for panel_id in list(self._touches):
+            self._async_release(panel_id)
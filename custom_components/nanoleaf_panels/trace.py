@@ -0,0 +1,93 @@
+"""Recording of the traffic between a controller and its device."""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta
+import gzip
+import json
+import time
+from typing import IO, Any
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+
+from .const import TRACE_FLUSH_INTERVAL
+
+# Record kinds: device info at the start, a raw line of the /events stream,
+# an outgoing request and a raw touch datagram.
+TRACE_INFO = "info"
+TRACE_SSE = "sse"
+TRACE_COMMAND = "cmd"
+TRACE_TOUCH = "touch"
+# Stands in for the auth token in recorded request paths.
+TRACE_TOKEN = "<token>"
+
+
+def read_trace(path: str) -> list[dict[str, Any]]:
+    """Return the records of a trace file."""
+    with gzip.open(path, "rt", encoding="utf-8") as trace:
+        return [json.loads(line) for line in trace if line.strip()]
+
+
+class TraceRecorder:
+    """Append timestamped records to a gzip compressed JSON lines file.
+
+    Records are buffered in memory and written in the executor every
+    TRACE_FLUSH_INTERVAL seconds, so recording costs the hot paths a list
+    append.
+    """
+
+    def __init__(self, hass: HomeAssistant, path: str) -> None:
+        """Initialize the recorder."""
+        self.hass = hass
+        self.path = path
+        self.records = 0
+        self._start = time.monotonic()
+        self._buffer: list[tuple[float, str, Any]] = []
+        self._file: IO[str] | None = None
+        self._lock = asyncio.Lock()
+        self._unsub_flush: CALLBACK_TYPE | None = None
+
+    async def async_start(self, info: dict[str, Any] | None) -> None:
+        """Open the trace file and record the device info."""
+        self._file = await self.hass.async_add_executor_job(
+            gzip.open, self.path, "wt", 6, "utf-8"
+        )
+        self._start = time.monotonic()
+        self.record(TRACE_INFO, info)
+        self._unsub_flush = async_track_time_interval(
+            self.hass, self._async_flush, timedelta(seconds=TRACE_FLUSH_INTERVAL)
+        )
+
+    @callback
+    def record(self, kind: str, value: Any) -> None:
+        """Buffer a record."""
+        self._buffer.append((time.monotonic() - self._start, kind, value))
+
+    async def _async_flush(self, now: datetime | None = None) -> None:
+        """Write the buffered records."""
+        async with self._lock:
+            buffer, self._buffer = self._buffer, []
+            if buffer and self._file is not None:
+                await self.hass.async_add_executor_job(self._write, buffer)
+
+    def _write(self, buffer: list[tuple[float, str, Any]]) -> None:
+        """Write records to the trace file."""
+        assert self._file is not None
+        for offset, kind, value in buffer:
+            self._file.write(
+                json.dumps({"t": round(offset, 6), kind: value}, separators=(",", ":"))
+                + "\n"
+            )
+        self.records += len(buffer)
+
+    async def async_stop(self) -> None:
+        """Write what is left and close the trace file."""
+        if self._unsub_flush is not None:
+            self._unsub_flush()
+            self._unsub_flush = None
+        await self._async_flush()
+        async with self._lock:
+            if self._file is not None:
+                await self.hass.async_add_executor_job(self._file.close)
+                self._file = None
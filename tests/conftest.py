@@ -0,0 +1,41 @@
+"""Fixtures running the controller against a fake device."""
+from __future__ import annotations
+
+from collections.abc import AsyncIterator
+from pathlib import Path
+
+import pytest_asyncio
+
+from homeassistant.core import HomeAssistant
+
+from benchmarks.fake_nanoleaf import FakeNanoleaf
+from custom_components.nanoleaf_panels.nanoleaf_controller import NanoleafController
+
+
+@pytest_asyncio.fixture
+async def hass(tmp_path: Path) -> AsyncIterator[HomeAssistant]:
+    """Return a running Home Assistant instance."""
+    hass = HomeAssistant(str(tmp_path))
+    await hass.async_start()
+    yield hass
+    await hass.async_stop(force=True)
+
+
+@pytest_asyncio.fixture
+async def device() -> AsyncIterator[FakeNanoleaf]:
+    """Return a fake device with six panels."""
+    device = FakeNanoleaf(panels=6)
+    await device.start()
+    yield device
+    await device.stop()
+
+
+@pytest_asyncio.fixture
+async def controller(
+    hass: HomeAssistant, device: FakeNanoleaf
+) -> AsyncIterator[NanoleafController]:
+    """Return a controller for the fake device with its info loaded."""
+    controller = NanoleafController(hass, device.netloc, device.token, batch_window=0)
+    await controller.get_info()
+    yield controller
+    controller.async_shutdown()
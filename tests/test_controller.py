@@ -0,0 +1,342 @@
+"""Tests of NanoleafController against a fake device."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+import copy
+
+import pytest
+
+from homeassistant.core import HomeAssistant
+
+from benchmarks.fake_nanoleaf import ExtControlReceiver, FakeNanoleaf
+from custom_components.nanoleaf_panels.command_scheduler import CommandScheduler
+from custom_components.nanoleaf_panels.const import (
+    CACHED_EFFECT_PREFIX,
+    MAX_CACHED_EFFECTS,
+)
+from custom_components.nanoleaf_panels.framebuffer import Framebuffer
+from custom_components.nanoleaf_panels.light import PanelLight
+from custom_components.nanoleaf_panels.nanoleaf_controller import (
+    EXT_CONTROL_EFFECT,
+    NanoleafController,
+)
+
+RED = (255, 0, 0)
+BLUE = (0, 0, 255)
+
+
+async def wait_until(condition: Callable[[], bool], timeout: float = 5) -> None:
+    """Wait until the condition holds."""
+    async with asyncio.timeout(timeout):
+        while not condition():
+            await asyncio.sleep(0.01)
+
+
+def displays(device: FakeNanoleaf) -> list[dict]:
+    """Return the effects displayed on the device, oldest first."""
+    return [write for write in device.effect_writes if write["command"] == "display"]
+
+
+def static_frame(device: FakeNanoleaf) -> dict[int, tuple[int, int, int]]:
+    """Decode the colours of the last static effect written to the device."""
+    values = displays(device)[-1]["animData"].split()[1:]
+    return {
+        int(values[index]): tuple(map(int, values[index + 2 : index + 5]))
+        for index in range(0, len(values), 7)
+    }
+
+
+def test_pack_ext_control() -> None:
+    """Encode the given panels with their brightness applied."""
+    framebuffer = Framebuffer([1, 2, 3])
+    framebuffer.update({1: (*RED, 0), 2: (*BLUE, 0)}, {2: 128})
+    receiver = ExtControlReceiver({1, 2, 3})
+
+    receiver.datagram_received(framebuffer.pack_ext_control({1: 5, 2: 0}), ("", 0))
+
+    assert receiver.errors == []
+    assert receiver.frames == [{1: (*RED, 0, 5), 2: (0, 0, 128, 0, 0)}]
+
+
+def test_pack_ext_control_skips_unknown_panels() -> None:
+    """Leave panels missing from the layout out of the frame."""
+    framebuffer = Framebuffer([1])
+    receiver = ExtControlReceiver({1})
+
+    receiver.datagram_received(framebuffer.pack_ext_control({1: 0, 9: 0}), ("", 0))
+
+    assert receiver.errors == []
+    assert list(receiver.frames[0]) == [1]
+
+
+async def test_stream_frames(
+    controller: NanoleafController, device: FakeNanoleaf
+) -> None:
+    """Stream every panel once, then only the panels that changed."""
+    panel_ids = controller.framebuffer.panel_ids
+    assert await controller.async_start_streaming(device.udp_port)
+    assert device.info["effects"]["select"] == EXT_CONTROL_EFFECT
+
+    await controller.async_set_panels({panel_ids[0]: (*RED, 2)})
+    await wait_until(lambda: len(device.ext_control.frames) == 1)
+    await controller.async_set_panels({panel_ids[1]: (*BLUE, 0)})
+    await wait_until(lambda: len(device.ext_control.frames) == 2)
+
+    first, second = device.ext_control.frames
+    assert device.ext_control.errors == []
+    assert set(first) == set(panel_ids)
+    assert first[panel_ids[0]] == (*RED, 0, 2)
+    assert second == {panel_ids[1]: (*BLUE, 0, 0)}
+
+
+async def test_stream_float_transition(
+    controller: NanoleafController, device: FakeNanoleaf
+) -> None:
+    """Stream transitions given as floats, and keep streaming after them."""
+    panel_ids = controller.framebuffer.panel_ids
+    assert await controller.async_start_streaming(device.udp_port)
+
+    await controller.display_static_effect(panel_ids[0], RED, 10.0)
+    await wait_until(lambda: len(device.ext_control.frames) == 1)
+    await controller.display_static_effect(panel_ids[1], BLUE, 1e6)
+    await wait_until(lambda: len(device.ext_control.frames) == 2)
+
+    first, second = device.ext_control.frames
+    assert device.ext_control.errors == []
+    assert first[panel_ids[0]] == (*RED, 0, 10)
+    assert second == {panel_ids[1]: (*BLUE, 0, 65535)}
+
+
+async def test_panel_light_float_transition_while_streaming(
+    controller: NanoleafController, device: FakeNanoleaf
+) -> None:
+    """Stream a panel turned on with a transition given in float seconds."""
+    panel_id = controller.framebuffer.panel_ids[0]
+    light = PanelLight(panel_id, "Panel01", controller, controller.info)
+    assert await controller.async_start_streaming(device.udp_port)
+
+    await light.async_turn_on(rgb_color=RED, transition=1.5)
+    await wait_until(lambda: len(device.ext_control.frames) == 1)
+    await light.async_turn_on(rgb_color=BLUE)
+    await wait_until(lambda: len(device.ext_control.frames) == 2)
+
+    assert device.ext_control.errors == []
+    assert device.ext_control.frames[0][panel_id] == (*RED, 0, 15)
+    assert device.ext_control.frames[1] == {panel_id: (*BLUE, 0, 15)}
+
+
+async def test_sse_parser(
+    hass: HomeAssistant, controller: NanoleafController, device: FakeNanoleaf
+) -> None:
+    """Apply events split over several lines, ignoring comments and CRs."""
+    task = hass.async_create_background_task(
+        controller.async_process_events_stream(), "test events"
+    )
+    await wait_until(lambda: device.connected_streams == 1)
+
+    device.push_sse_line(": keep-alive")
+    device.push_sse_line("id: 1\r")
+    device.push_sse_line('data: {"events": [{"attr": 2,')
+    device.push_sse_line('data:  "value": 42}]}')
+    device.push_sse_line("")
+    device.push_event(1, [{"attr": 1, "value": False}])
+    await wait_until(lambda: controller.stats.events["1"] == 2)
+
+    assert controller.info["state"]["brightness"]["value"] == 42
+    assert controller.info["state"]["on"]["value"] is False
+    task.cancel()
+
+
+async def test_malformed_events_dropped(
+    hass: HomeAssistant, controller: NanoleafController, device: FakeNanoleaf
+) -> None:
+    """Drop events that cannot be applied and keep reading the stream."""
+    task = hass.async_create_background_task(
+        controller.async_process_events_stream(), "test events"
+    )
+    await wait_until(lambda: device.connected_streams == 1)
+
+    device.push_sse_line("id: 1")
+    device.push_sse_line("data: {not json")
+    device.push_sse_line("")
+    device.push_event(1, [{"value": 10}])
+    device.push_event(3, [None])
+    device.push_event(1, [{"attr": 2, "value": 42}])
+    await wait_until(lambda: controller.stats.events["1"] == 1)
+
+    assert controller.stats.malformed_events == 3
+    assert controller.info["state"]["brightness"]["value"] == 42
+    assert not task.done()
+    task.cancel()
+
+
+async def test_effect_catalogue_retried(
+    hass: HomeAssistant, device: FakeNanoleaf
+) -> None:
+    """Fetch the effect catalogue again after the first fetch failed."""
+    controller = NanoleafController(hass, device.netloc, device.token, batch_window=0)
+    controller.info = copy.deepcopy(device.info)
+    device.failure_rate = 1
+    assert not await controller.async_refresh_effects()
+
+    device.failure_rate = 0
+    await controller.async_refresh()
+    await wait_until(lambda: bool(controller.effects))
+
+    assert controller.effect_list == ["Northern Lights"]
+
+
+def cached_effects(device: FakeNanoleaf) -> set[str]:
+    """Return the cached effects installed on the device."""
+    return {name for name in device.effects if name.startswith(CACHED_EFFECT_PREFIX)}
+
+
+def custom_effect(index: int) -> dict:
+    """Return a distinct custom effect."""
+    return {"animType": "custom", "animData": f"1 1000 1 {index} 0 0 0 1"}
+
+
+async def test_effect_cache_concurrent(
+    controller: NanoleafController, device: FakeNanoleaf
+) -> None:
+    """Stay within the cache size when effects are displayed concurrently."""
+    for index in range(MAX_CACHED_EFFECTS):
+        assert await controller.async_display_cached(custom_effect(index))
+
+    results = await asyncio.gather(
+        *(
+            controller.async_display_cached(custom_effect(index))
+            for index in range(MAX_CACHED_EFFECTS, MAX_CACHED_EFFECTS + 5)
+        )
+    )
+
+    assert all(results)
+    assert len(cached_effects(device)) == MAX_CACHED_EFFECTS
+
+
+async def test_effect_cache_keeps_entry_on_failed_select(
+    controller: NanoleafController, device: FakeNanoleaf
+) -> None:
+    """Keep a cached effect when selecting it fails for another reason than 404."""
+    assert await controller.async_display_cached(custom_effect(0))
+    device.failure_rate = 1
+    assert not await controller.async_display_cached(custom_effect(0))
+    device.failure_rate = 0
+
+    writes = len(device.effect_writes)
+    assert await controller.async_display_cached(custom_effect(0))
+    assert len(device.effect_writes) == writes
+    assert len(cached_effects(device)) == 1
+
+
+async def test_scheduler_latest_wins(hass: HomeAssistant) -> None:
+    """Send only the latest of the commands submitted while one is held back."""
+    scheduler = CommandScheduler(hass)
+    sent: list[int] = []
+
+    def command(value: int) -> Callable[[], asyncio.Future]:
+        async def send() -> int:
+            sent.append(value)
+            return value
+
+        return send
+
+    results = await asyncio.gather(
+        *(scheduler.async_submit("target", command(value), 0.01) for value in range(3))
+    )
+
+    assert sent == [2]
+    assert results == [2, 2, 2]
+    assert scheduler.in_flight == scheduler.queued == 0
+
+
+async def test_scheduler_queues_behind_running_command(hass: HomeAssistant) -> None:
+    """Send the latest command queued behind a running one once it is done."""
+    scheduler = CommandScheduler(hass)
+    release = asyncio.Event()
+    sent: list[str] = []
+
+    async def slow() -> str:
+        sent.append("slow")
+        await release.wait()
+        return "slow"
+
+    async def send(value: str) -> str:
+        sent.append(value)
+        return value
+
+    first = asyncio.ensure_future(scheduler.async_submit("target", slow))
+    await wait_until(lambda: sent == ["slow"])
+    queued = [
+        asyncio.ensure_future(scheduler.async_submit("target", lambda v=v: send(v)))
+        for v in ("a", "b")
+    ]
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await first == "slow"
+    assert await asyncio.gather(*queued) == ["b", "b"]
+    assert sent == ["slow", "b"]
+
+
+def test_framebuffer_merged() -> None:
+    """Keep untouched panels and scale every colour by its panel brightness."""
+    framebuffer = Framebuffer([1, 2, 3], BLUE)
+    framebuffer.update({}, {3: 0})
+
+    merged = dict(framebuffer.merged({1: (*RED, 4), 9: (1, 2, 3, 0)}, {2: 51}))
+
+    assert merged == {
+        1: (*RED, 4),
+        2: (0, 0, 51, 0),
+        3: (0, 0, 0, 0),
+        9: (1, 2, 3, 0),
+    }
+
+
+def test_framebuffer_changes() -> None:
+    """Skip panels already shown, but only while the framebuffer is valid."""
+    framebuffer = Framebuffer([1, 2])
+    framebuffer.update({1: (*RED, 0)})
+    frame = {1: (*RED, 3), 2: (*BLUE, 0)}
+
+    assert framebuffer.changes(frame) == frame
+    framebuffer.valid = True
+    assert framebuffer.changes(frame) == {2: (*BLUE, 0)}
+    assert framebuffer.changes(frame, {1: 10}) == frame
+
+
+async def test_set_panels_skips_unchanged_frame(
+    controller: NanoleafController, device: FakeNanoleaf
+) -> None:
+    """Write the whole frame once, skip a repeat, and write again after an effect."""
+    panel_ids = controller.framebuffer.panel_ids
+    frame = {panel_ids[0]: (*RED, 0)}
+
+    assert await controller.async_set_panels(frame)
+    assert len(displays(device)) == 1
+    assert set(static_frame(device)) == set(panel_ids)
+    assert static_frame(device)[panel_ids[0]] == RED
+
+    assert await controller.async_set_panels(frame)
+    assert len(displays(device)) == 1
+
+    assert await controller.async_select_effect("Northern Lights")
+    assert await controller.async_set_panels(frame)
+    assert len(displays(device)) == 2
+
+
+@pytest.mark.parametrize("level", [0, 128])
+async def test_set_panels_full_level(
+    controller: NanoleafController, device: FakeNanoleaf, level: int
+) -> None:
+    """Show the panels named by set_panels at full level."""
+    panel_id = controller.framebuffer.panel_ids[0]
+    await controller.display_static_effect(panel_id, RED, 0, level)
+    assert controller.framebuffer.get_brightness(panel_id) == level
+
+    await controller.async_set_panels({panel_id: (*BLUE, 0)})
+
+    assert controller.framebuffer.get_brightness(panel_id) == 255
+    assert static_frame(device)[panel_id] == BLUE